@@ -0,0 +1,301 @@
+# Headless HTTP/JSON API over the core generators, for services that call them at volume.
+#
+#   python api.py                      # serves on API_PORT (8000)
+#
+# Authenticate with an API token from POST /v1/tokens, sent as "Authorization: Bearer <token>".
+#
+#   POST   /v1/tokens                  {"username", "password", "name"} -> {"token"}
+#   DELETE /v1/tokens                  revoke the token used for the request
+#   GET    /v1/features                features with their fields and defaults
+#   POST   /v1/generate/<feature>      JSON fields -> {"text", ...}; ?stream=1 for NDJSON chunks
+#   POST   /v1/fanout/<feature>        {"fields", "options", "versions"} -> NDJSON line per output as it finishes
+#   POST   /v1/caption                 multipart "image" field or a raw image body -> caption, tags, description
+#
+# Prometheus metrics are not served on API_PORT but on a separate listener,
+# METRICS_HOST:API_METRICS_PORT (loopback, 9465, by default).
+#
+# All generation endpoints accept ?bypass_cache=1 to regenerate instead of reusing a cached answer.
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import tornado.web
+from dotenv import load_dotenv
+from tornado.iostream import StreamClosedError
+
+import core
+from auth import init_db, login_user, create_api_token, resolve_api_token, revoke_api_token
+from history import init_history
+from metrics import METRICS_HOST, start_metrics_server, track_request
+from scheduler import is_quota_error
+
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "32"))
+API_MAX_BODY_MB = int(os.getenv("API_MAX_BODY_MB", "20"))
+# Own port so the API and the Streamlit app (METRICS_PORT) can both be scraped on one host; 0 turns it off
+API_METRICS_PORT = int(os.getenv("API_METRICS_PORT", "9465") or 0)
+
+# Generation, bcrypt and SQLite calls block, so they run here and the event loop only does I/O
+_executor = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="api")
+
+
+def _run(fn, *args):
+    return asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+
+def _flag(value):
+    return value.lower() in ("1", "true", "yes")
+
+
+# What the client gets back besides the text itself
+def _summary(result):
+    return {key: result.get(key) for key in ("feature", "model", "cache", "timings", "trimmed", "truncated", "prompt_tokens", "preprocess")}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Status code and message for an exception raised by the core
+def _error_status(error):
+    if isinstance(error, ApiError):
+        return error.status, str(error)
+    if isinstance(error, ValueError):
+        return 400, str(error)
+    if is_quota_error(error):
+        return 429, "The model is over its request quota right now. Please try again in a minute."
+    return 502, f"Generation failed due to {error}"
+
+
+class BaseHandler(tornado.web.RequestHandler):
+    auth_required = True
+
+    async def prepare(self):
+        self.set_header("Content-Type", "application/json")
+        if self.auth_required:
+            await self.authenticate()
+
+    # Resolve the bearer token to a users.db username, raises a 401 if there is none
+    async def authenticate(self):
+        header = self.request.headers.get("Authorization", "")
+        self.token = header[7:].strip() if header.lower().startswith("bearer ") else None
+        self.current_user = await _run(resolve_api_token, self.token) if self.token else None
+        if self.current_user is None:
+            raise ApiError(401, "Missing or invalid API token")
+
+    def json_body(self):
+        try:
+            body = json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise ApiError(400, "Request body must be JSON")
+        if not isinstance(body, dict):
+            raise ApiError(400, "Request body must be a JSON object")
+        return body
+
+    def api_key(self):
+        key = os.getenv("apikey")
+        if not key:
+            raise ApiError(503, "No model API key is configured")
+        return key
+
+    def send_json(self, data, status=200):
+        self.set_status(status)
+        self.finish(json.dumps(data, ensure_ascii=False))
+
+    def write_error(self, status_code, **kwargs):
+        error = kwargs.get("exc_info", (None, None, None))[1]
+        if error is not None and not isinstance(error, tornado.web.HTTPError):
+            status_code, message = _error_status(error)
+        else:
+            message = self._reason
+        self.set_status(status_code)
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps({"error": message}))
+
+    # Newline-delimited JSON from a blocking generator: one line per item, then a final line.
+    # The generator runs on a worker thread and hands items to the event loop through a queue;
+    # a client that disconnects stops it at the next item.
+    async def send_ndjson(self, make_items, line_for, final):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        self.cancelled = threading.Event()
+
+        def produce():
+            items = make_items()
+            try:
+                for item in items:
+                    if self.cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, ("item", item))
+                loop.call_soon_threadsafe(queue.put_nowait, ("done", None))
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, ("error", e))
+            finally:
+                items.close()
+
+        producer = loop.run_in_executor(_executor, produce)
+        started = False
+        while True:
+            kind, value = await queue.get()
+            if kind == "error" and not started:
+                raise value
+            if not started:
+                self.set_header("Content-Type", "application/x-ndjson")
+                started = True
+            if kind == "item":
+                line = line_for(value)
+            elif kind == "error":
+                line = {"error": _error_status(value)[1]}
+            else:
+                line = final()
+            try:
+                self.write(json.dumps(line, ensure_ascii=False) + "\n")
+                await self.flush()
+            except StreamClosedError:
+                self.cancelled.set()
+                return
+            if kind != "item":
+                break
+        await producer
+        self.finish()
+
+    def on_connection_close(self):
+        if getattr(self, "cancelled", None) is not None:
+            self.cancelled.set()
+
+    def log_exception(self, typ, value, tb):
+        # Client and model errors are answered with a status code, not logged as crashes
+        if not isinstance(value, (ApiError, ValueError)) and not is_quota_error(value):
+            super().log_exception(typ, value, tb)
+
+
+class TokenHandler(BaseHandler):
+    auth_required = False
+
+    async def post(self):
+        body = self.json_body()
+        username, password = body.get("username"), body.get("password")
+        if not username or not password:
+            raise ApiError(400, "username and password are required")
+
+        def issue():
+            with track_request("API Token", user=username) as request:
+                if not login_user(username, password):
+                    request['status'] = 'denied'
+                    return None
+                return create_api_token(username, str(body.get("name") or ""))
+
+        token = await _run(issue)
+        if token is None:
+            raise ApiError(401, "Invalid username or password")
+        self.send_json({"token": token, "username": username}, 201)
+
+    async def delete(self):
+        await self.authenticate()
+        await _run(revoke_api_token, self.token)
+        self.send_json({"revoked": True})
+
+
+class FeaturesHandler(BaseHandler):
+    auth_required = False
+
+    def get(self):
+        self.send_json({name: {"label": spec["label"], "fields": spec["fields"], "defaults": spec["defaults"]}
+                        for name, spec in core.FEATURES.items()})
+
+
+class GenerateHandler(BaseHandler):
+    async def post(self, feature):
+        if feature not in core.FEATURES:
+            raise ApiError(404, f"Unknown feature {feature!r}")
+        fields = self.json_body()
+        bypass_cache = _flag(self.get_query_argument("bypass_cache", "0"))
+        if _flag(self.get_query_argument("stream", "0")):
+            await self.stream(feature, fields, bypass_cache)
+            return
+        result = await _run(core.generate, feature, fields, self.api_key(), self.current_user, bypass_cache)
+        self.send_json(dict(_summary(result), text=result["text"]))
+
+    async def stream(self, feature, fields, bypass_cache):
+        result = {}
+        api_key = self.api_key()
+        await self.send_ndjson(lambda: core.stream(feature, fields, api_key, self.current_user, result, True, bypass_cache),
+                               lambda chunk: {"text": chunk}, lambda: dict(_summary(result), done=True))
+
+
+class FanOutHandler(BaseHandler):
+    # {"fields": {...}, "options": {"tone": [...], "language": [...]}, "versions": 2} -> one NDJSON
+    # line per output as it finishes, with the index of its option combination and its version
+    async def post(self, feature):
+        if feature not in core.FEATURES:
+            raise ApiError(404, f"Unknown feature {feature!r}")
+        body = self.json_body()
+        fields, options = body.get("fields") or {}, body.get("options") or {}
+        if not isinstance(fields, dict) or not isinstance(options, dict) or not all(isinstance(v, list) for v in options.values()):
+            raise ApiError(400, "fields must be an object and options an object of lists")
+        try:
+            count = int(body.get("versions", 1))
+        except (TypeError, ValueError):
+            raise ApiError(400, "versions must be a number")
+        variants = core.expand_options(fields, options)
+        if count < 1 or len(variants) * count > core.FANOUT_MAX_OUTPUTS:
+            raise ApiError(400, f"Ask for between 1 and {core.FANOUT_MAX_OUTPUTS} outputs")
+        for variant in variants:
+            core.build_prompt(feature, variant)  # missing fields are a 400 up front, not a failure per output
+        bypass_cache = _flag(self.get_query_argument("bypass_cache", "0"))
+        api_key = self.api_key()
+
+        def line(item):
+            index, result = item
+            data = dict(_summary(result), index=index, version=result["version"],
+                        options={name: variants[index][name] for name, values in options.items() if values})
+            if result.get("error") is not None:
+                return dict(data, error=_error_status(result["error"])[1])
+            return dict(data, text=result["text"])
+
+        await self.send_ndjson(lambda: core.fan_out(feature, variants, api_key, self.current_user, count, bypass_cache),
+                               line, lambda: {"done": True, "outputs": len(variants) * count})
+
+
+class CaptionHandler(BaseHandler):
+    async def post(self):
+        files = self.request.files.get("image")
+        if files:
+            data = files[0]["body"]
+        elif self.request.headers.get("Content-Type", "").startswith("image/"):
+            data = self.request.body
+        else:
+            raise ApiError(400, "Send the image as a multipart 'image' field or as a raw image/* body")
+        bypass_cache = _flag(self.get_query_argument("bypass_cache", "0"))
+        result = await _run(core.caption, data, self.api_key(), self.current_user, bypass_cache)
+        image = result.pop("image")
+        self.send_json(dict(result, size=list(image.size), original_size=list(image.original_size)))
+
+
+def make_app():
+    return tornado.web.Application([
+        (r"/v1/tokens", TokenHandler),
+        (r"/v1/features", FeaturesHandler),
+        (r"/v1/generate/(\w+)", GenerateHandler),
+        (r"/v1/fanout/(\w+)", FanOutHandler),
+        (r"/v1/caption", CaptionHandler),
+    ])
+
+
+async def main():
+    load_dotenv()
+    init_db()
+    init_history()
+    make_app().listen(API_PORT, max_body_size=API_MAX_BODY_MB * 1024 * 1024)
+    print(f"Smart Content Studio API listening on :{API_PORT}")
+    if start_metrics_server(API_METRICS_PORT, METRICS_HOST):
+        print(f"Metrics on {METRICS_HOST}:{API_METRICS_PORT}/metrics")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,39 @@
+import hashlib
+import os
+from functools import lru_cache
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+
+# URL of a file under static/, versioned by its content hash. Tornado sends a
+# long-lived Cache-Control header for static requests that carry a ?v= argument,
+# and a new hash means a new URL whenever the file changes.
+@lru_cache(maxsize=None)
+def static_url(name):
+    with open(os.path.join(STATIC_DIR, name), "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    return f"app/static/{name}?v={digest}"
+
+
+# Add the stylesheet to the page head once per session. The <style> tag outlives the
+# zero-height component that inserted it, so later reruns don't send any CSS at all.
+def inject_css_once(name):
+    url = static_url(name)
+    if st.session_state.get('_injected_css') == url:
+        return
+    st.session_state['_injected_css'] = url
+    components.html(f"""<script>
+        const doc = window.parent.document;
+        const href = new URL("{url}", window.parent.location.href);
+        if (!doc.getElementById("{name}")) {{
+            fetch(href).then(response => response.text()).then(css => {{
+                const style = doc.createElement("style");
+                style.id = "{name}";
+                style.textContent = css;
+                doc.head.appendChild(style);
+            }});
+        }}
+        </script>""", height=0)
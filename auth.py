@@ -0,0 +1,178 @@
+import hashlib
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import bcrypt
+
+from metrics import stage
+
+DB_PATH = os.getenv("USERS_DB", "users.db")
+POOL_SIZE = int(os.getenv("AUTH_DB_POOL_SIZE", "4"))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(min(4, os.cpu_count() or 1))))
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(12 * 3600)))
+
+
+# Small pool of long-lived connections in WAL mode so readers don't block each other
+class ConnectionPool:
+    def __init__(self, path=DB_PATH, size=POOL_SIZE):
+        self.path = path
+        self.connections = queue.Queue()
+        for _ in range(size):
+            self.connections.put(self._connect())
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self.connections.get()
+        try:
+            yield conn
+        finally:
+            self.connections.put(conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# bcrypt releases the GIL, so a few threads keep hashing off the Streamlit script thread
+_bcrypt_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+# Initialize DB tables
+def init_db():
+    with get_pool().connection() as conn:
+        c = conn.cursor()
+        c.execute('''CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT UNIQUE NOT NULL,
+                    email TEXT UNIQUE NOT NULL,
+                    password TEXT NOT NULL
+                    )''')
+        c.execute('''CREATE TABLE IF NOT EXISTS sessions (
+                    token_hash TEXT PRIMARY KEY,
+                    username TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                    )''')
+        c.execute('''CREATE TABLE IF NOT EXISTS api_tokens (
+                    token_hash TEXT PRIMARY KEY,
+                    username TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                    )''')
+        conn.commit()
+
+
+def hash_password(password):
+    with stage("bcrypt"):
+        return _bcrypt_pool.submit(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS)).result()
+
+
+def check_password(password, hashed):
+    with stage("bcrypt"):
+        return _bcrypt_pool.submit(bcrypt.checkpw, password.encode('utf-8'), hashed).result()
+
+
+# Sign up function
+def signup_user(username, email, password):
+    if not email.endswith("@gmail.com"):
+        return "Invalid email address. Only Gmail addresses are allowed."
+
+    hashed_password = hash_password(password)
+    with get_pool().connection() as conn:
+        try:
+            conn.execute("INSERT INTO users (username, email, password) VALUES (?, ?, ?)", (username, email, hashed_password))
+            conn.commit()
+            return True
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            return False
+
+
+# Login function
+def login_user(username, password):
+    with get_pool().connection() as conn:
+        record = conn.execute("SELECT password FROM users WHERE username=?", (username,)).fetchone()
+    if record:
+        if check_password(password, record[0]):
+            return True
+    return False
+
+
+def _token_hash(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+# Issue a session token after a successful login so refreshes skip the bcrypt verify
+def create_session(username):
+    token = secrets.token_urlsafe(32)
+    with get_pool().connection() as conn:
+        conn.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),))
+        conn.execute("INSERT INTO sessions (token_hash, username, expires_at) VALUES (?, ?, ?)",
+                     (_token_hash(token), username, time.time() + SESSION_TTL_SECONDS))
+        conn.commit()
+    return token
+
+
+# Username for a valid session token, or None
+def resume_session(token):
+    if not token:
+        return None
+    with get_pool().connection() as conn:
+        record = conn.execute("SELECT username FROM sessions WHERE token_hash=? AND expires_at >= ?",
+                              (_token_hash(token), time.time())).fetchone()
+    return record[0] if record else None
+
+
+def end_session(token):
+    if not token:
+        return
+    with get_pool().connection() as conn:
+        conn.execute("DELETE FROM sessions WHERE token_hash=?", (_token_hash(token),))
+        conn.commit()
+
+
+# Long-lived token for the HTTP API, stored hashed like session tokens. Only returned once.
+def create_api_token(username, name=""):
+    token = "scs_" + secrets.token_urlsafe(32)
+    with get_pool().connection() as conn:
+        conn.execute("INSERT INTO api_tokens (token_hash, username, name, created_at) VALUES (?, ?, ?, ?)",
+                     (_token_hash(token), username, name, time.time()))
+        conn.commit()
+    return token
+
+
+# Username for a valid API token, or None
+def resolve_api_token(token):
+    if not token:
+        return None
+    with get_pool().connection() as conn:
+        record = conn.execute("SELECT username FROM api_tokens WHERE token_hash=?", (_token_hash(token),)).fetchone()
+    return record[0] if record else None
+
+
+def revoke_api_token(token):
+    if not token:
+        return False
+    with get_pool().connection() as conn:
+        cur = conn.execute("DELETE FROM api_tokens WHERE token_hash=?", (_token_hash(token),))
+        conn.commit()
+        return cur.rowcount > 0
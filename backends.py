@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "gemini")
+FAKE_LATENCY_MS = float(os.getenv("FAKE_LATENCY_MS", "300"))
+FAKE_TOKENS_PER_SECOND = float(os.getenv("FAKE_TOKENS_PER_SECOND", "80"))
+FAKE_OUTPUT_TOKENS = int(os.getenv("FAKE_OUTPUT_TOKENS", "200"))
+FAKE_ERROR_RATE = float(os.getenv("FAKE_ERROR_RATE", "0"))
+FAKE_SEED = int(os.getenv("FAKE_SEED", "0"))
+
+
+# Real backend: google.generativeai, imported only when the first model is built
+class GeminiBackend:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.configured_key = None
+
+    def model(self, api_key, model_name):
+        import google.generativeai as genai
+        with self.lock:
+            if self.configured_key != api_key:
+                genai.configure(api_key=api_key)
+                self.configured_key = api_key
+        return genai.GenerativeModel(model_name)
+
+
+# Same class name and code as google.api_core's 429 error, so the scheduler treats it as retryable
+class ResourceExhausted(Exception):
+    code = 429
+
+
+class FakeUsage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class FakeTokenCount:
+    def __init__(self, total_tokens):
+        self.total_tokens = total_tokens
+
+
+class FakePart:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeContent:
+    def __init__(self, text):
+        self.parts = [FakePart(text)]
+
+
+class FakeCandidate:
+    def __init__(self, text, finish_reason):
+        self.content = FakeContent(text)
+        self.finish_reason = finish_reason
+
+
+class FakeResponse:
+    def __init__(self, text, usage, candidates=None, finish_reason="STOP"):
+        self.candidates = [FakeCandidate(candidate, finish_reason) for candidate in (candidates or [text])]
+        self.usage_metadata = usage
+
+    # Like the real response, .text only works for a single candidate
+    @property
+    def text(self):
+        if len(self.candidates) > 1:
+            raise ValueError("The response has multiple candidates, use response.candidates")
+        return self.candidates[0].content.parts[0].text
+
+
+WORDS = ("content studio draft idea team launch customer insight story growth update plan message "
+         "project quality together future simple clear brand value thanks meeting share").split()
+
+
+# Offline stand-in for GenerativeModel. Output depends only on the seed and the request, and
+# latency follows a fixed time-to-first-token plus a token rate, so runs are repeatable.
+class FakeModel:
+    def __init__(self, model_name, latency_ms=FAKE_LATENCY_MS, tokens_per_second=FAKE_TOKENS_PER_SECOND,
+                 output_tokens=FAKE_OUTPUT_TOKENS, error_rate=FAKE_ERROR_RATE, seed=FAKE_SEED):
+        self.model_name = model_name if model_name.startswith("models/") else f"models/{model_name}"
+        self.latency = latency_ms / 1000.0
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.seed = seed
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def _request_text(self, contents):
+        parts = contents if isinstance(contents, list) else [contents]
+        texts = []
+        for part in parts:
+            if isinstance(part, dict) and "data" in part:
+                texts.append(hashlib.sha256(part["data"]).hexdigest())
+            else:
+                texts.append(str(part))
+        return "\n".join(texts)
+
+    def _tokens(self, rng, request, generation_config):
+        config = dict(generation_config or {})
+        count = min(self.output_tokens, config.get("max_output_tokens") or self.output_tokens)
+        if config.get("response_mime_type") == "application/json":
+            words = [rng.choice(WORDS) for _ in range(max(8, count - 12))]
+            text = json.dumps({"caption": " ".join(words[:6]).capitalize(),
+                               "tags": ["#" + word for word in words[:5]],
+                               "description": " ".join(words[6:]).capitalize() + "."})
+            return [text[i:i + 16] for i in range(0, len(text), 16)]
+        return [rng.choice(WORDS) + " " for _ in range(count)]
+
+    def count_tokens(self, contents):
+        return FakeTokenCount(max(1, len(self._request_text(contents)) // 4))
+
+    def generate_content(self, contents, stream=False, generation_config=None, **kwargs):
+        request = self._request_text(contents)
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        rng = random.Random(f"{self.seed}:{self.model_name}:{request}")
+        # Errors are drawn per call, so a retry of the same request can succeed
+        if random.Random(f"{self.seed}:error:{call}").random() < self.error_rate:
+            time.sleep(self.latency / 2)
+            raise ResourceExhausted("429 Resource has been exhausted (fake backend)")
+
+        tokens = self._tokens(rng, request, generation_config)
+        config = dict(generation_config or {})
+        count = int(config.get("candidate_count") or 1)
+        usage = FakeUsage(max(1, len(request) // 4), len(tokens) * count)
+        # The fake answer is output_tokens long, so a smaller max_output_tokens cuts it off
+        finish_reason = "MAX_TOKENS" if (config.get("max_output_tokens") or self.output_tokens) < self.output_tokens else "STOP"
+        if stream:
+            return self._stream(tokens, usage, finish_reason)
+        # Candidates are decoded in parallel, so extra ones add tokens but not time
+        time.sleep(self.latency + len(tokens) / self.tokens_per_second)
+        candidates = ["".join(tokens).strip()] + ["".join(self._tokens(random.Random(f"{self.seed}:{request}:{n}"), request, generation_config)).strip()
+                                                  for n in range(1, count)]
+        return FakeResponse(candidates[0], usage, candidates, finish_reason)
+
+    def _stream(self, tokens, usage, finish_reason):
+        time.sleep(self.latency)
+        for start in range(0, len(tokens), 8):
+            chunk = tokens[start:start + 8]
+            time.sleep(len(chunk) / self.tokens_per_second)
+            # Like the real API, only the last chunk says why generation stopped
+            yield FakeResponse("".join(chunk), usage, finish_reason=finish_reason if start + 8 >= len(tokens) else None)
+
+
+class FakeBackend:
+    def model(self, api_key, model_name):
+        return FakeModel(model_name)
+
+
+BACKENDS = {"gemini": GeminiBackend, "fake": FakeBackend}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+# Backend picked by MODEL_BACKEND, shared by the whole process
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if MODEL_BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown MODEL_BACKEND {MODEL_BACKEND!r}, expected one of {', '.join(BACKENDS)}")
+            _backend = BACKENDS[MODEL_BACKEND]()
+        return _backend
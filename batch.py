@@ -0,0 +1,162 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import core
+from generation import generate_text
+from metrics import stage, track_request
+from response_cache import get_cache, make_key
+
+BATCH_DIR = os.getenv("BATCH_DIR", "batches")
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_REQUESTS_PER_MINUTE = int(os.getenv("BATCH_REQUESTS_PER_MINUTE", "60"))
+
+# Core feature and columns for each bulk feature; the columns match the form fields
+FEATURES = {name: (feature, core.FEATURES[feature]["fields"]) for name, feature in
+            (("Email Compose", "email_compose"), ("Linkedin Post", "linkedin"), ("Twitter/X Post", "twitter"))}
+
+
+# Spaces requests evenly so a batch never goes over the per-minute quota
+class MinuteRateLimiter:
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        time.sleep(max(0.0, slot - now))
+
+
+# Rows from an uploaded CSV or JSONL file, with column names lower-cased. Raises ValueError
+# naming the first JSONL line that isn't a JSON object.
+def read_rows(data, filename):
+    text = data.decode('utf-8-sig')
+    if filename.lower().endswith((".jsonl", ".json")):
+        rows = []
+        for number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"line {number} is not valid JSON ({e})")
+            if not isinstance(row, dict):
+                raise ValueError(f"line {number} is not a JSON object")
+            rows.append(row)
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+    return [{str(key).strip().lower(): value for key, value in row.items() if key is not None} for row in rows]
+
+
+# Fill the feature's prompt template from a row, falling back to the form defaults and then the
+# core feature defaults for blank columns. Returns the prompt, its generation_config and whether
+# the free-text column was trimmed.
+def build_prompt(feature, row, defaults):
+    name, columns = FEATURES[feature]
+    values = dict(core.FEATURES[name]["defaults"], **defaults)
+    values.update({key: value for key, value in row.items() if value not in (None, "")})
+    missing = [column for column in columns if column not in values]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    return core.build_prompt(name, {column: values[column] for column in columns})
+
+
+# Results file for a job; the same upload and settings map to the same file so a rerun resumes it
+def job_path(feature, data, defaults):
+    digest = hashlib.sha256(json.dumps([feature, defaults], sort_keys=True).encode('utf-8') + data).hexdigest()
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    return os.path.join(BATCH_DIR, f"{digest[:16]}.jsonl")
+
+
+# Records already written to a results file; the last record for a row wins
+def load_results(path):
+    records = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # a torn last line from a crash
+                records[record["row"]] = record
+    return records
+
+
+def _generate_row(model, feature, index, row, defaults, limiter, bypass_cache):
+    record = {"row": index, "input": row}
+    try:
+        with track_request(f"Bulk Generation - {feature}", model.model_name) as request:
+            with stage("prompt"):
+                prompt, config, trimmed = build_prompt(feature, row, defaults)
+            if trimmed:
+                record["trimmed"] = request["trimmed"] = True
+            cache = get_cache()
+            key = make_key(model.model_name, prompt, config)
+            text, tier = (None, None) if bypass_cache else cache.get(key)
+            request["cache"] = tier or ("bypass" if bypass_cache else "miss")
+            latency = 0.0
+            if text is None:
+                with stage("rate_limit"):
+                    limiter.acquire()
+                text, timings = generate_text(model, prompt, generation_config=config)
+                latency = timings["total"]
+                if timings["truncated"]:
+                    # Cut off at max_output_tokens: kept in the results, but not cached
+                    record["truncated"] = request["truncated"] = True
+                else:
+                    cache.put(key, model.model_name, text, latency)
+        record.update({"status": "ok", "output": text, "latency": latency})
+    except Exception as e:
+        record.update({"status": "error", "error": str(e)})
+    return record
+
+
+# Generate every row with bounded concurrency, appending each record to the results file as it
+# completes. Rows that already succeeded in an earlier run are yielded first and not regenerated.
+def run_batch(model, feature, rows, defaults, path, concurrency=BATCH_CONCURRENCY,
+              per_minute=BATCH_REQUESTS_PER_MINUTE, bypass_cache=False):
+    done = {index: record for index, record in load_results(path).items() if record.get("status") == "ok"}
+    for index in sorted(done):
+        yield dict(done[index], resumed=True)
+
+    limiter = MinuteRateLimiter(per_minute)
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch")
+    try:
+        futures = [pool.submit(_generate_row, model, feature, index, row, defaults, limiter, bypass_cache)
+                   for index, row in enumerate(rows) if index not in done]
+        with open(path, "a", encoding='utf-8') as out:
+            for future in as_completed(futures):
+                record = future.result()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                yield record
+    finally:
+        # Stopping mid-batch (Stop button, rerun) drops the queued rows instead of waiting for them
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Final results in row order as JSONL or CSV for download
+def export_results(path, fmt):
+    results = load_results(path)
+    records = [results[index] for index in sorted(results)]
+    if fmt == "jsonl":
+        return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+    input_columns = sorted({column for record in records for column in record.get("input", {})})
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["row", "status"] + input_columns + ["output", "error"])
+    for record in records:
+        writer.writerow([record["row"], record["status"]]
+                        + [record.get("input", {}).get(column, "") for column in input_columns]
+                        + [record.get("output", ""), record.get("error", "")])
+    return buffer.getvalue()
@@ -0,0 +1,310 @@
+# End-to-end benchmark of the app's script flows against the offline fake model backend.
+#
+#   python benchmarks/app_bench.py                    # compare against benchmarks/baseline.json
+#   python benchmarks/app_bench.py --save-baseline    # record a new baseline
+#
+# Each flow (login, every generator branch, image captioning) is driven through main.py with
+# AppTest, the same way a browser session drives reruns. The latency phase runs the flows in one
+# session and reports p50/p95/p99 plus CPU time and peak Python allocations per rerun. The load
+# phase runs N sessions at once and reports throughput. AppTest swaps a global runtime on every
+# run, so concurrent sessions are separate processes sharing the same SQLite files. Every flow
+# ticks "Bypass cache / regenerate" so each timed run calls the model: the two phases share
+# CACHE_DB and their inputs overlap, and answers cut off at the length limit are never cached.
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+USERNAME = "bench"
+PASSWORD = "bench-password"
+
+
+def configure_environment(tmp, args):
+    os.environ.update({
+        "MODEL_BACKEND": "fake",
+        "FAKE_LATENCY_MS": str(args.latency_ms),
+        "FAKE_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "FAKE_OUTPUT_TOKENS": str(args.output_tokens),
+        "FAKE_ERROR_RATE": str(args.error_rate),
+        "USERS_DB": os.path.join(tmp, "users.db"),
+        "CACHE_DB": os.path.join(tmp, "cache.db"),
+        "BATCH_DIR": os.path.join(tmp, "batches"),
+        "METRICS_LOG": os.path.join(tmp, "requests.jsonl"),
+        "METRICS_PORT": "0",
+        "BCRYPT_ROUNDS": "4",
+        # The scheduler's quotas are for the real API; keep them out of the way of the fake
+        "GEMINI_KEY_RPM": "1000000",
+        "GEMINI_MODEL_RPM": "1000000",
+        "GEMINI_BURST": "1000000",
+        "GEMINI_BACKOFF_BASE": "0.05",
+    })
+    os.environ.setdefault("apikey", "fake-key")
+
+
+def _import_app_modules():
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+
+
+def _session(username=USERNAME):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(MAIN, default_timeout=120)
+    if username:
+        at.session_state["username"] = username
+    at.run()
+    return at
+
+
+def _choose(at, option, sub=None):
+    at.sidebar.selectbox[0].set_value(option).run()
+    next(box for box in at.sidebar.checkbox if box.label == "Bypass cache / regenerate").check().run()
+    if sub is not None:
+        widget = at.sidebar.radio[0] if option == "Email Generation" else at.sidebar.selectbox[1]
+        widget.set_value(sub).run()
+    return at
+
+
+def _submit(at):
+    at.main.button[0].click()
+    return at
+
+
+# Each flow prepares a session and returns the rerun to time
+def flow_login(i):
+    at = _session(None)
+    at.selectbox[0].set_value("Login").run()
+    at.text_input[0].input(USERNAME)
+    at.text_input[1].input(PASSWORD)
+    at.button[0].click()
+    return at
+
+
+def flow_essay(i):
+    at = _choose(_session(), "Essay Generation")
+    at.main.text_input[0].input(f"Remote work, take {i}")
+    at.main.text_input[1].input("productivity and wellbeing")
+    return _submit(at)
+
+
+def flow_text(i):
+    at = _choose(_session(), "Text Generation")
+    at.main.text_input[0].input(f"Give me three taglines for a coffee shop ({i})")
+    return _submit(at)
+
+
+def flow_email_compose(i):
+    at = _choose(_session(), "Email Generation", "Compose")
+    at.sidebar.text_input[1].input(f"Customer {i}")
+    at.main.text_input[0].input("Product launch")
+    at.main.text_input[1].input(f"Invite to launch event number {i}")
+    return _submit(at)
+
+
+def flow_email_reply(i):
+    at = _choose(_session(), "Email Generation", "Reply")
+    at.sidebar.text_input[0].input("Support team")
+    at.sidebar.text_input[1].input(f"Customer {i}")
+    at.main.text_area[0].input(f"Hi, my order {i} arrived damaged. Can you send a replacement?")
+    at.main.text_input[0].input("Damaged order")
+    at.main.text_input[1].input("Apologize and arrange a replacement")
+    return _submit(at)
+
+
+def flow_linkedin(i):
+    at = _choose(_session(), "Post Generation", "Linkedin")
+    at.sidebar.text_input[0].input("Data engineering")
+    at.main.text_area[0].input(f"We shipped version {i} of our pipeline")
+    return _submit(at)
+
+
+def flow_twitter(i):
+    at = _choose(_session(), "Post Generation", "Twitter/X")
+    at.main.text_area[0].input(f"Our meetup number {i} is this Friday")
+    return _submit(at)
+
+
+# AppTest can't drive st.file_uploader, so the image flow calls the core function the
+# Upload button calls: decode, downscale, caption through the scheduler
+class ImageFlow:
+    def __init__(self, i):
+        from PIL import Image
+        img = Image.new("RGB", (3000, 2000), (i % 256, 120, 200))
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG")
+        self.data = buffer.getvalue()
+
+    def run(self):
+        import core
+        core.caption(self.data, os.environ["apikey"], USERNAME, bypass_cache=True)
+        return self
+
+
+def flow_image(i):
+    return ImageFlow(i)
+
+
+FLOWS = {
+    "login": flow_login,
+    "essay": flow_essay,
+    "text": flow_text,
+    "email_compose": flow_email_compose,
+    "email_reply": flow_email_reply,
+    "linkedin": flow_linkedin,
+    "twitter": flow_twitter,
+    "image": flow_image,
+}
+
+
+def _check(name, at):
+    exceptions = getattr(at, "exception", None)
+    if exceptions:
+        raise RuntimeError(f"{name} flow raised: {exceptions[0].message}")
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+# Latency phase: one session, each flow repeated, timing only the rerun that does the work
+def latency_phase(iterations):
+    _import_app_modules()
+    results = {}
+    for name, flow in FLOWS.items():
+        # One untimed pass so first-use imports and model construction don't land in p95
+        flow(-1).run()
+        latencies, cpu, memory = [], [], []
+        for i in range(iterations):
+            at = flow(i)
+            tracemalloc.start()
+            cpu_start = time.process_time()
+            start = time.perf_counter()
+            at.run()
+            latencies.append(time.perf_counter() - start)
+            cpu.append(time.process_time() - cpu_start)
+            memory.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            _check(name, at)
+        results[name] = {
+            "p50_ms": _percentile(latencies, 50) * 1000,
+            "p95_ms": _percentile(latencies, 95) * 1000,
+            "p99_ms": _percentile(latencies, 99) * 1000,
+            "cpu_ms": statistics.mean(cpu) * 1000,
+            "peak_kb": statistics.mean(memory) / 1024,
+        }
+    return results
+
+
+def _load_worker(args):
+    worker, iterations = args
+    _import_app_modules()
+    latencies = []
+    for i in range(iterations):
+        for name, flow in FLOWS.items():
+            at = flow(worker * 1000 + i)
+            start = time.perf_counter()
+            at.run()
+            latencies.append(time.perf_counter() - start)
+            _check(name, at)
+    return latencies
+
+
+# Load phase: N concurrent sessions each cycling through every flow
+def load_phase(sessions, iterations):
+    context = multiprocessing.get_context("spawn")
+    start = time.perf_counter()
+    with context.Pool(sessions) as pool:
+        latencies = [value for chunk in pool.map(_load_worker, [(worker, iterations) for worker in range(sessions)]) for value in chunk]
+    elapsed = time.perf_counter() - start
+    return {
+        "sessions": sessions,
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+
+
+# Regressions: a flow's p95 or the load p95 got slower, or throughput dropped, beyond tolerance
+def compare(report, baseline, tolerance):
+    failures = []
+    for name, stats in report["flows"].items():
+        old = baseline["flows"].get(name)
+        if old and stats["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            failures.append(f"{name}: p95 {stats['p95_ms']:.0f} ms vs baseline {old['p95_ms']:.0f} ms")
+    old_load = baseline.get("load")
+    if old_load and old_load["sessions"] == report["load"]["sessions"]:
+        if report["load"]["throughput_rps"] < old_load["throughput_rps"] * (1 - tolerance):
+            failures.append(f"throughput {report['load']['throughput_rps']:.2f} rps vs baseline {old_load['throughput_rps']:.2f} rps")
+        if report["load"]["p95_ms"] > old_load["p95_ms"] * (1 + tolerance):
+            failures.append(f"load p95 {report['load']['p95_ms']:.0f} ms vs baseline {old_load['p95_ms']:.0f} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--load-iterations", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--tokens-per-second", type=float, default=400)
+    parser.add_argument("--output-tokens", type=int, default=120)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_environment(tmp, args)
+        _import_app_modules()
+        import auth
+        auth.init_db()
+        auth.signup_user(USERNAME, f"{USERNAME}@gmail.com", PASSWORD)
+
+        # AppTest replaces sys.modules["__main__"] when it runs the script, which breaks pickling
+        # the worker function, so the load phase runs before this process touches AppTest
+        load = load_phase(args.sessions, args.load_iterations)
+        report = {
+            "settings": {key: getattr(args, key) for key in ("iterations", "latency_ms", "tokens_per_second", "output_tokens", "error_rate")},
+            "flows": latency_phase(args.iterations),
+            "load": load,
+        }
+
+    print(f"{'flow':15s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'cpu ms':>8s} {'peak KB':>8s}")
+    for name, stats in report["flows"].items():
+        print(f"{name:15s} {stats['p50_ms']:8.0f} {stats['p95_ms']:8.0f} {stats['p99_ms']:8.0f} {stats['cpu_ms']:8.0f} {stats['peak_kb']:8.0f}")
+    load = report["load"]
+    print(f"\n{load['sessions']} sessions: {load['requests']} requests, {load['throughput_rps']:.2f} req/s, "
+          f"p50 {load['p50_ms']:.0f} ms, p95 {load['p95_ms']:.0f} ms, p99 {load['p99_ms']:.0f} ms")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            failures = compare(report, json.load(f), args.tolerance)
+        if failures:
+            print("\nRegressions against baseline:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Login throughput before and after the auth rework.
+#
+#   python benchmarks/auth_load.py --threads 8 --logins 200
+#
+# "before" replays the original per-call sqlite3.connect + inline bcrypt code,
+# "after" goes through auth.py (pooled WAL connections, bcrypt worker pool).
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Original login_user from main.py, kept here as the baseline
+def legacy_login_user(db_path, username, password):
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    c.execute("SELECT password FROM users WHERE username=?", (username,))
+    record = c.fetchone()
+    conn.close()
+    if record:
+        if bcrypt.checkpw(password.encode('utf-8'), record[0]):
+            return True
+    return False
+
+
+def seed(db_path, users, rounds):
+    conn = sqlite3.connect(db_path)
+    conn.execute('''CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL
+                )''')
+    hashed = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds))
+    conn.executemany("INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
+                     [(f"user{i}", f"user{i}@gmail.com", hashed) for i in range(users)])
+    conn.commit()
+    conn.close()
+
+
+def run(login, threads, logins, users):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda i: login(f"user{i % users}", "secret"), range(logins)))
+    elapsed = time.perf_counter() - start
+    assert all(results)
+    return logins / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=int(os.getenv("BCRYPT_ROUNDS", "12")))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "users.db")
+        seed(db_path, args.users, args.rounds)
+
+        before = run(lambda u, p: legacy_login_user(db_path, u, p), args.threads, args.logins, args.users)
+
+        os.environ["USERS_DB"] = db_path
+        import auth
+        auth.init_db()
+        after = run(auth.login_user, args.threads, args.logins, args.users)
+
+        # A refresh with a session token skips bcrypt entirely
+        token = auth.create_session("user0")
+        resumed = run(lambda u, p: auth.resume_session(token) == "user0", args.threads, args.logins, args.users)
+
+    print(f"before:  {before:8.1f} logins/s")
+    print(f"after:   {after:8.1f} logins/s")
+    print(f"resumed: {resumed:8.1f} sessions/s (token, no bcrypt)")
+
+
+if __name__ == "__main__":
+    main()
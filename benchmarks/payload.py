@@ -0,0 +1,61 @@
+# Bytes of ForwardMsg traffic the script sends to the browser on the first run and on each rerun.
+#
+#   python benchmarks/payload.py --reruns 5
+#
+# Counts the serialized size of every message the script enqueues, so it matches
+# what goes over the websocket (before compression) for each widget interaction.
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, sys
+from streamlit.runtime.scriptrunner_utils.script_run_context import ScriptRunContext
+from streamlit.testing.v1 import AppTest
+
+sent = [0]
+enqueue = ScriptRunContext.enqueue
+def counting_enqueue(self, msg):
+    sent[0] += msg.ByteSize()
+    return enqueue(self, msg)
+ScriptRunContext.enqueue = counting_enqueue
+
+username, reruns = sys.argv[1], int(sys.argv[2])
+at = AppTest.from_file("main.py", default_timeout=60)
+if username:
+    at.session_state["username"] = username
+at.run()
+first = sent[0]
+
+per_rerun = []
+for _ in range(reruns):
+    sent[0] = 0
+    at.run()
+    per_rerun.append(sent[0])
+print(json.dumps({"first": first, "reruns": per_rerun}))
+"""
+
+
+def measure(username, reruns):
+    output = subprocess.run([sys.executable, "-c", CHILD, username, str(reruns)],
+                            cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args()
+
+    for name, username in [("logged out", ""), ("logged in", "bench")]:
+        result = measure(username, args.reruns)
+        print(f"{name:10s} first run {result['first']:7d} bytes   "
+              f"per rerun {max(result['reruns']):7d} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Cold-start and per-rerun script time for main.py, measured headlessly with AppTest.
+#
+#   python benchmarks/startup.py --reruns 20
+#
+# Each measurement runs in a fresh interpreter so module imports count towards cold start.
+# Run it on two revisions to compare before and after a change.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+
+username, option, reruns = sys.argv[1], sys.argv[2], int(sys.argv[3])
+at = AppTest.from_file("main.py", default_timeout=60)
+if username:
+    at.session_state["username"] = username
+
+start = time.perf_counter()
+at.run()
+cold = time.perf_counter() - start
+if option:
+    at.sidebar.selectbox[0].set_value(option)
+
+times = []
+for _ in range(reruns):
+    start = time.perf_counter()
+    at.run()
+    times.append(time.perf_counter() - start)
+
+heavy = [name for name in ("google.generativeai", "PIL.Image") if name in sys.modules]
+print(json.dumps({"cold": cold, "reruns": times, "heavy_imports": heavy}))
+"""
+
+
+def measure(username, option, reruns):
+    output = subprocess.run([sys.executable, "-c", CHILD, username, option, str(reruns)],
+                            cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reruns", type=int, default=20)
+    args = parser.parse_args()
+
+    scenarios = [("logged out", "", ""), ("email", "bench", "Email Generation"), ("image", "bench", "Image Captioning and Tagging")]
+    for name, username, option in scenarios:
+        result = measure(username, option, args.reruns)
+        print(f"{name:10s} cold start {result['cold'] * 1000:7.1f} ms   "
+              f"rerun median {statistics.median(result['reruns']) * 1000:6.1f} ms   "
+              f"heavy imports: {', '.join(result['heavy_imports']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from email_thread import condense_thread
+from generation import get_model, generate_text, generate_candidates, stream_text, fit_prompt, count_prompt_tokens, MAX_PROMPT_TOKENS
+from history import save_generation
+from metrics import stage, track_request
+from prompts import essay_prompt, compose_email_prompt, reply_email_prompt, linkedin_post_prompt, twitter_post_prompt, length_config
+from response_cache import get_cache, make_key
+from scheduler import user_pool
+
+TEXT_MODEL = os.getenv("TEXT_MODEL", "gemini-pro")
+IMAGE_MODEL = 'gemini-1.5-flash'
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", "4"))
+FANOUT_MAX_OUTPUTS = int(os.getenv("FANOUT_MAX_OUTPUTS", "8"))
+# Models whose generation_config accepts candidate_count > 1; others get one request per version.
+# The default TEXT_MODEL, gemini-pro, only returns one candidate, so it is not listed.
+CANDIDATE_COUNT_MODELS = set(os.getenv("CANDIDATE_COUNT_MODELS", "gemini-1.5-flash,gemini-1.5-pro").split(","))
+VERSION_NOTE = "\n\nThis is version {number} of {count}. Use a different angle, opening and wording from the other versions."
+
+# Every text generator, shared by the Streamlit UI, the HTTP API and bulk generation.
+# label is the name recorded in history and metrics; free_text is the field trimmed when the
+# prompt is too long; kind picks the length_config; fields without a default are required.
+# preprocess, when set, rewrites the free-text field with the model before the prompt is built.
+FEATURES = {
+    "essay": {
+        "label": "Essay Generation", "template": essay_prompt, "kind": "essay",
+        "fields": ["topic", "length", "additional"], "free_text": "additional",
+        "defaults": {"length": "medium - approx 350 words", "additional": ""},
+    },
+    "text": {
+        "label": "Text Generation", "template": lambda prompt: prompt, "kind": "text",
+        "fields": ["prompt"], "free_text": "prompt", "defaults": {},
+    },
+    "email_compose": {
+        "label": "Email Generation - Compose", "template": compose_email_prompt, "kind": "email",
+        "fields": ["sender", "receiver", "subject", "purpose", "length", "tone", "language"], "free_text": "purpose",
+        "defaults": {"receiver": "", "length": "medium - approx 350 words", "tone": "Friendly", "language": "English"},
+    },
+    "email_reply": {
+        "label": "Email Generation - Reply", "template": reply_email_prompt, "kind": "email",
+        "fields": ["sender", "receiver", "received", "subject", "purpose", "length", "tone", "language"], "free_text": "received",
+        "defaults": {"length": "medium - approx 350 words", "tone": "Friendly", "language": "English"},
+        "preprocess": condense_thread,
+    },
+    "linkedin": {
+        "label": "Post Generation - Linkedin", "template": linkedin_post_prompt, "kind": "linkedin",
+        "fields": ["style", "length", "domain", "description"], "free_text": "description",
+        "defaults": {"style": "Professional", "length": "small - approx 150 words", "domain": ""},
+    },
+    "twitter": {
+        "label": "Post Generation - Twitter/X", "template": twitter_post_prompt, "kind": "twitter",
+        "fields": ["style", "length", "description"], "free_text": "description",
+        "defaults": {"style": "Professional", "length": "small - approx 50 words"},
+    },
+}
+
+
+def _spec(feature):
+    if feature not in FEATURES:
+        raise ValueError(f"Unknown feature {feature!r}, expected one of {', '.join(FEATURES)}")
+    return FEATURES[feature]
+
+
+# Prompt, generation_config and trimmed flag for a feature's fields, raises ValueError on missing fields.
+# version (number, count) asks for one of several distinct versions of the same request.
+def build_prompt(feature, fields, version=None):
+    spec = _spec(feature)
+    values = dict(spec["defaults"])
+    values.update({key: value for key, value in fields.items() if value is not None})
+    missing = [field for field in spec["fields"] if field not in values]
+    if missing:
+        raise ValueError(f"Missing field(s): {', '.join(missing)}")
+    values = {field: str(values[field]) for field in spec["fields"]}
+    free_text = spec["free_text"]
+    prompt, trimmed = fit_prompt(lambda text: spec["template"](**dict(values, **{free_text: text})), values[free_text])
+    config = length_config(spec["kind"], values.get("length") if spec["kind"] != "text" else None, values.get("language"), TEXT_MODEL)
+    if version:
+        prompt += VERSION_NOTE.format(number=version[0], count=version[1])
+    return prompt, config, trimmed
+
+
+# Preprocess and build the prompt inside a tracked request, recording what happened in result
+def _prepare(spec, feature, fields, model, user, request, result, version=None, bypass_cache=False):
+    result.update({"feature": feature, "model": model.model_name, "text": None, "cache": None,
+                   "timings": None, "trimmed": False, "truncated": False, "prompt_tokens": None, "preprocess": None})
+    free_text = spec["free_text"]
+    if spec.get("preprocess") and fields.get(free_text):
+        # e.g. long reply threads: quoted history and signatures stripped, earlier messages summarized
+        with stage("preprocess"):
+            text, result['preprocess'] = spec["preprocess"](model, str(fields[free_text]), user, bypass_cache)
+        fields = dict(fields, **{free_text: text})
+    with stage("prompt"):
+        prompt, config, result['trimmed'] = build_prompt(feature, fields, version)
+    if result['trimmed']:
+        request['trimmed'] = True
+    return prompt, config
+
+
+# Count the prompt before anything is sent. Trimming keeps the free-text field within the limit,
+# so a prompt still over it (long fixed fields, or count_tokens disagreeing with the estimate) is
+# refused with a ValueError rather than sent.
+def _preflight(model, prompt, result):
+    with stage("preflight"):
+        result['prompt_tokens'] = count_prompt_tokens(model, prompt)
+    if result['prompt_tokens'] > MAX_PROMPT_TOKENS:
+        raise ValueError(f"The prompt is about {result['prompt_tokens']} tokens, over the {MAX_PROMPT_TOKENS} token limit. "
+                         "Shorten the input and try again.")
+
+
+# Generate a feature's text, yielding chunks as they arrive (one chunk when streaming=False or
+# when the answer comes from the cache). result is filled with the full text, cache tier,
+# timings, trimmed flag (prompt shortened), truncated flag (answer cut off at max_output_tokens)
+# and prompt size. Fresh outputs are saved to the user's history and, unless cut off, cached.
+# on_ready, when given, is called with result once the prompt is built and checked, before the
+# model is called, so the UI can show notes about the input above the output.
+def stream(feature, fields, api_key, user=None, result=None, streaming=True, bypass_cache=False, version=None,
+           on_ready=None):
+    result = {} if result is None else result
+    spec = _spec(feature)
+    model = get_model(api_key, TEXT_MODEL)
+    with track_request(spec["label"], model.model_name, user) as request:
+        prompt, config = _prepare(spec, feature, fields, model, user, request, result, version, bypass_cache)
+
+        cache = get_cache()
+        key = make_key(model.model_name, prompt, config)
+        if not bypass_cache:
+            text, tier = cache.get(key)
+            if text is not None:
+                request['cache'] = result['cache'] = tier
+                result['text'] = text
+                if on_ready:
+                    on_ready(result)
+                yield text
+                return
+        request['cache'] = result['cache'] = 'bypass' if bypass_cache else 'miss'
+
+        _preflight(model, prompt, result)
+        if on_ready:
+            on_ready(result)
+        # Shared with the request record, so time to first token lands in the request log too
+        timings = result['timings'] = request['timings'] = {}
+        if streaming:
+            chunks = []
+            for chunk in stream_text(model, prompt, timings, user, generation_config=config):
+                chunks.append(chunk)
+                yield chunk
+            text = "".join(chunks)
+        else:
+            text, measured = generate_text(model, prompt, user, generation_config=config)
+            timings.update(measured)
+            yield text
+        result['text'] = text
+        if timings['truncated']:
+            result['truncated'] = request['truncated'] = True
+        if text:
+            if not result['truncated']:
+                cache.put(key, model.model_name, text, timings['total'])
+            if user:
+                save_generation(user, spec["label"], prompt, config, text, model.model_name, timings)
+
+
+# Blocking form of stream, returns the filled result
+def generate(feature, fields, api_key, user=None, bypass_cache=False, version=None):
+    result = {}
+    for _ in stream(feature, fields, api_key, user, result, streaming=False, bypass_cache=bypass_cache, version=version):
+        pass
+    return result
+
+
+# count versions of one request from a single call with candidate_count, one result per candidate
+def generate_versions(feature, fields, api_key, user=None, count=2, bypass_cache=False):
+    spec = _spec(feature)
+    model = get_model(api_key, TEXT_MODEL)
+    with track_request(spec["label"], model.model_name, user) as request:
+        base = {}
+        prompt, config = _prepare(spec, feature, fields, model, user, request, base, bypass_cache=bypass_cache)
+        config = dict(config, candidate_count=count)
+        cache = get_cache()
+        key = make_key(model.model_name, prompt, config)
+        cached, tier = (None, None) if bypass_cache else cache.get(key)
+        request['cache'] = base['cache'] = tier or ('bypass' if bypass_cache else 'miss')
+        if cached is not None:
+            texts = json.loads(cached)
+        else:
+            _preflight(model, prompt, base)
+            texts, base['timings'] = generate_candidates(model, prompt, user, generation_config=config)
+            truncated = base['timings']['truncated']
+            if any(truncated):
+                request['truncated'] = True
+            else:
+                cache.put(key, model.model_name, json.dumps(texts), base['timings']['total'])
+            if user:
+                for text in texts:
+                    save_generation(user, spec["label"], prompt, config, text, model.model_name, base['timings'])
+            return [dict(base, text=text, version=number, truncated=cut)
+                    for number, (text, cut) in enumerate(zip(texts, truncated), start=1)]
+        return [dict(base, text=text, version=number) for number, text in enumerate(texts, start=1)]
+
+
+# Field sets for every combination of the chosen options, e.g. {"tone": ["Friendly", "Formal"]}
+def expand_options(fields, options):
+    names = [name for name, values in options.items() if values]
+    return [dict(fields, **dict(zip(names, combo))) for combo in itertools.product(*(options[name] for name in names))]
+
+
+def _one_version(feature, fields, api_key, user, bypass_cache, number, count):
+    result = generate(feature, fields, api_key, user, bypass_cache, (number, count) if count > 1 else None)
+    return [dict(result, version=number)]
+
+
+# Run one fan-out job against the user's fan-out concurrency pool instead of the general one
+def _fanout_job(fn, *args):
+    with user_pool("fanout"):
+        return fn(*args)
+
+
+# Outputs for several field sets (one per tone, language or style), count versions of each, all
+# generated concurrently. Versions come from one candidate_count request where the model supports
+# it, otherwise from separate requests. Yields (index into variants, result) as each finishes;
+# a failed output has its exception in result["error"].
+def fan_out(feature, variants, api_key, user=None, count=1, bypass_cache=False):
+    model = get_model(api_key, TEXT_MODEL)
+    use_candidates = count > 1 and model.model_name.split("/")[-1] in CANDIDATE_COUNT_MODELS
+    jobs = []
+    for index, fields in enumerate(variants):
+        if use_candidates:
+            jobs.append((index, None, generate_versions, (feature, fields, api_key, user, count, bypass_cache)))
+        else:
+            jobs += [(index, number, _one_version, (feature, fields, api_key, user, bypass_cache, number, count))
+                     for number in range(1, count + 1)]
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(FANOUT_WORKERS, len(jobs))), thread_name_prefix="fanout")
+    try:
+        futures = {pool.submit(_fanout_job, fn, *args): (index, number) for index, number, fn, args in jobs}
+        for future in as_completed(futures):
+            index, number = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                versions = [number] if number else range(1, count + 1)
+                results = [{"feature": feature, "text": None, "version": version, "error": e} for version in versions]
+            for result in results:
+                yield index, result
+    finally:
+        # Stopping mid-way (Stop button, rerun, client gone) drops the requests not yet started
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Caption, tags and description for uploaded image bytes. The image is downscaled before it is
+# sent, and the same bytes and encoding settings reuse the cached answer.
+def caption(data, api_key, user=None, bypass_cache=False):
+    # PIL is only needed here, so it is imported on first use
+    from image_captioning import caption_image, STRUCTURED_PROMPT
+    from image_pipeline import prepare_image, IMAGE_MAX_EDGE, IMAGE_QUALITY
+    from PIL.Image import DecompressionBombError
+    model = get_model(api_key, IMAGE_MODEL)
+    with track_request("Image Captioning and Tagging", model.model_name, user) as request:
+        with stage("image_decode"):
+            try:
+                image = prepare_image(data)
+            except (OSError, DecompressionBombError):
+                # PIL's UnidentifiedImageError is an OSError: the upload isn't an image it can read
+                raise ValueError("not a valid image")
+        settings = {"max_edge": IMAGE_MAX_EDGE, "quality": IMAGE_QUALITY}
+        cache = get_cache()
+        key = make_key(model.model_name, f"image:{image.digest}", settings)
+        cached, tier = (None, None) if bypass_cache else cache.get(key)
+        request['cache'] = status = tier or ('bypass' if bypass_cache else 'miss')
+        if cached is not None:
+            answer = json.loads(cached)
+        else:
+            start = time.perf_counter()
+            answer = caption_image(model, image.as_part(), user)
+            elapsed = time.perf_counter() - start
+            cache.put(key, model.model_name, json.dumps(answer), elapsed)
+            if user:
+                save_generation(user, "Image Captioning and Tagging", f"{STRUCTURED_PROMPT}\n[image {image.digest}]", settings,
+                                f"Caption: {answer['caption']}\n\nTags: {answer['tags']}\n\nDescription: {answer['description']}",
+                                model.model_name, {"total": elapsed})
+        return dict(answer, image=image, cache=status, model=model.model_name)
@@ -0,0 +1,180 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from generation import generate_text, estimate_tokens
+from metrics import submit
+from response_cache import get_cache, make_key
+from scheduler import user_pool
+
+# Threads shorter than this (after cleaning) go into the reply prompt as they are
+THREAD_SUMMARY_THRESHOLD = int(os.getenv("THREAD_SUMMARY_THRESHOLD", "1500"))
+# Messages longer than this are split into chunks that are summarized separately
+THREAD_CHUNK_TOKENS = int(os.getenv("THREAD_CHUNK_TOKENS", "1500"))
+THREAD_SUMMARY_WORKERS = int(os.getenv("THREAD_SUMMARY_WORKERS", "4"))
+SUMMARY_CONFIG = {"max_output_tokens": 200, "temperature": 0.2}
+
+SUMMARY_PROMPT = """Summarize this email from a thread in 2-4 sentences for someone writing a reply. Keep who wrote it, every request, question, date, number and commitment, and drop greetings and pleasantries. Answer with the summary only.
+
+{message}"""
+
+# Lines that start an earlier message when a thread is pasted: Gmail/Apple quote headers and
+# Outlook/forward separators. A header block (see _is_header_block) also starts one.
+_QUOTE_HEADER = re.compile(r"^\s*On\s.{0,200}?\bwrote:\s*$", re.IGNORECASE)
+_SEPARATOR = re.compile(r"^\s*-{2,}\s*(?:Original Message|Forwarded message)\s*-{2,}", re.IGNORECASE)
+# A header line has a header-like value: an address after From/To/Cc, a date after Sent/Date
+_HEADER = re.compile(r"^\s*(?:(?:From|To|Cc):\s.*(?:@|<[^>]*>)|(?:Sent|Date):\s.*(?:\b\d{4}\b|\b\d{1,2}[/.-]\d{1,2}[/.-]\d{2})"
+                     r"|Subject:\s)", re.IGNORECASE)
+_RULE = re.compile(r"^(?:--|__+)\s*$")
+_MOBILE_SIGNATURE = re.compile(r"^\s*Sent from my \w+|^\s*Get Outlook for \w+", re.IGNORECASE)
+_SIGN_OFF = re.compile(r"^\s*(?:best|thanks|thank you|regards|best regards|kind regards|cheers|sincerely|br)\b.{0,20}$", re.IGNORECASE)
+# A "--" signature block is at most this many lines long
+SIGNATURE_MAX_LINES = 6
+_DISCLAIMER = re.compile(r"\b(?:confidential|intended (?:solely )?for the (?:use of the )?(?:named )?(?:addressee|recipient)"
+                         r"|if you (?:are not|have received this)|privileged|unauthori[sz]ed (?:use|disclosure))\b", re.IGNORECASE)
+
+
+# Line index where the message's signature starts, or None. A "--" or "___" line only starts one
+# when it is the last such line, sits in the final SIGNATURE_MAX_LINES lines and ends the text, is
+# the standard "-- " delimiter or follows a sign-off; elsewhere it is body text ("Steps:\n--\n...").
+def _signature_start(lines):
+    for index, line in enumerate(lines):
+        if _MOBILE_SIGNATURE.match(line):
+            return index
+    rules = [index for index, line in enumerate(lines) if _RULE.match(line)]
+    if not rules or len(lines) - rules[-1] - 1 > SIGNATURE_MAX_LINES:
+        return None
+    start = rules[-1]
+    before = [line for line in lines[:start] if line.strip()][-2:]
+    after = [line for line in lines[start + 1:] if line.strip()]
+    if not after or lines[start] == "-- " or any(_SIGN_OFF.match(line) for line in before):
+        return start
+    return None
+
+
+# Signature block and trailing legal disclaimer paragraphs removed from one message
+def clean_message(text):
+    lines = text.splitlines()
+    lines = [line.rstrip() for line in lines[:_signature_start(lines)]]
+    paragraphs = [p.strip() for p in "\n".join(lines).split("\n\n") if p.strip()]
+    # A disclaimer sits at the end of the message and trips two or more of the usual phrases
+    while paragraphs and len(_DISCLAIMER.findall(paragraphs[-1])) >= 2:
+        paragraphs.pop()
+    return "\n\n".join(paragraphs)
+
+
+# Number of consecutive header lines starting at lines[start]
+def _header_run(lines, start):
+    end = start
+    while end < len(lines) and _HEADER.match(lines[end]):
+        end += 1
+    return end - start
+
+
+# An Outlook or forwarded-message header block: two or more header lines, one of them From:,
+# at the start of the text or after a blank or rule line. A lone "Subject: ..." line, or header-like
+# lines running on from body text, are body text and are kept.
+def _is_header_block(lines, start, run):
+    if start > 0 and lines[start - 1].strip() and not _RULE.match(lines[start - 1]):
+        return False
+    return run >= 2 and any(line.lstrip().lower().startswith("from:") for line in lines[start:start + run])
+
+
+# Messages of a pasted thread, newest first. Quote markers are removed so quoted history
+# becomes its own messages, header blocks are dropped only where a message starts, and
+# repeated copies of a message (quoted again in every later reply) are kept once.
+def split_messages(thread):
+    lines = [re.sub(r"^(?:\s*>)+ ?", "", line) for line in thread.splitlines()]
+    messages, current = [], []
+    index, after_separator = 0, False
+    while index < len(lines):
+        line = lines[index]
+        if _QUOTE_HEADER.match(line) or _SEPARATOR.match(line):
+            messages.append(current)
+            current = []
+            after_separator = bool(_SEPARATOR.match(line))
+            index += 1
+            continue
+        run = _header_run(lines, index)
+        if run and (after_separator or _is_header_block(lines, index, run)):
+            # The headers of the message that starts here; right after a separator it has already begun
+            if not after_separator:
+                messages.append(current)
+                current = []
+            index += run
+        else:
+            current.append(line)
+            index += 1
+        after_separator = False
+    messages.append(current)
+
+    seen, result = set(), []
+    for lines in messages:
+        message = clean_message("\n".join(lines))
+        fingerprint = " ".join(message.split()).lower()
+        if message and fingerprint not in seen:
+            seen.add(fingerprint)
+            result.append(message)
+    return result
+
+
+# Paragraph-aligned pieces of a message, each under THREAD_CHUNK_TOKENS
+def chunk_message(message, limit=THREAD_CHUNK_TOKENS):
+    chunks, current = [], ""
+    for paragraph in message.split("\n\n"):
+        candidate = f"{current}\n\n{paragraph}" if current else paragraph
+        if current and estimate_tokens(candidate) > limit:
+            chunks.append(current)
+            candidate = paragraph
+        while estimate_tokens(candidate) > limit:
+            cut = limit * 4
+            chunks.append(candidate[:cut])
+            candidate = candidate[cut:]
+        current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# One chunk's summary and whether it came from the cache (this exact text was summarized before).
+# bypass_cache regenerates the summary and refreshes the cached copy.
+def _summarize(model, text, user, bypass_cache=False):
+    prompt = SUMMARY_PROMPT.format(message=text)
+    cache = get_cache()
+    key = make_key(model.model_name, prompt, SUMMARY_CONFIG)
+    summary, _ = (None, None) if bypass_cache else cache.get(key)
+    if summary is not None:
+        return summary, True
+    summary, timings = generate_text(model, prompt, user, generation_config=SUMMARY_CONFIG)
+    summary = summary.strip()
+    if not timings["truncated"]:
+        cache.put(key, model.model_name, summary, timings["total"])
+    return summary, False
+
+
+# Received mail ready for the reply prompt, plus stats. Short threads are only cleaned. Long
+# ones keep the newest message and replace the earlier ones with summaries made concurrently;
+# summaries are cached per chunk, so replying again on a thread only summarizes new messages.
+def condense_thread(model, thread, user=None, bypass_cache=False):
+    messages = split_messages(thread)
+    stats = {"messages": len(messages), "summarized": 0, "cached": 0}
+    cleaned = "\n\n".join(messages)
+    if estimate_tokens(cleaned) <= THREAD_SUMMARY_THRESHOLD or not messages:
+        return cleaned, stats
+
+    latest, earlier = messages[0], messages[1:]
+    parts = [(0, chunk) for chunk in chunk_message(latest)] if estimate_tokens(latest) > THREAD_CHUNK_TOKENS else []
+    parts += [(index, chunk) for index, message in enumerate(earlier, start=1) for chunk in chunk_message(message)]
+    # Summaries count against the user's sub-call pool rather than the general per-user cap
+    with ThreadPoolExecutor(max_workers=THREAD_SUMMARY_WORKERS, thread_name_prefix="thread-summary") as pool, user_pool("subcalls"):
+        futures = [submit(pool, _summarize, model, chunk, user, bypass_cache) for _, chunk in parts]
+        summaries = [future.result() for future in futures]
+
+    by_message = {}
+    for (index, _), (summary, cached) in zip(parts, summaries):
+        by_message.setdefault(index, []).append(summary)
+        stats["cached" if cached else "summarized"] += 1
+    newest = " ".join(by_message[0]) if 0 in by_message else latest
+    history = [f"- {' '.join(by_message[index])}" for index in range(len(messages) - 1, 0, -1)]
+    text = f"{newest}\n\nEarlier in this thread (summaries, oldest first):\n" + "\n".join(history)
+    return text, stats
@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+
+from backends import get_backend
+from scheduler import get_scheduler
+
+# Prompts above this many tokens are trimmed (free-text fields) or flagged before sending
+MAX_PROMPT_TOKENS = int(os.getenv("MAX_PROMPT_TOKENS", "6000"))
+# "estimate" counts locally; "api" asks the model's count_tokens, which costs a round trip
+PROMPT_TOKEN_COUNTER = os.getenv("PROMPT_TOKEN_COUNTER", "estimate")
+TRIM_MARKER = "\n[... trimmed to fit the prompt size limit]"
+
+_models = {}
+# API key each handle was built with, by id(); handles live for the whole process
+_model_keys = {}
+_models_lock = threading.Lock()
+
+
+# One model handle per API key and model name, built once and shared across sessions and reruns.
+# The backend (real Gemini or the offline fake) is chosen with MODEL_BACKEND.
+def get_model(api_key, model_name):
+    with _models_lock:
+        if (api_key, model_name) not in _models:
+            model = _models[(api_key, model_name)] = get_backend().model(api_key, model_name)
+            _model_keys[id(model)] = api_key
+        return _models[(api_key, model_name)]
+
+
+# API key of a handle from get_model, for the scheduler's per-key rate limits and coalescing
+def model_key(model):
+    return _model_keys.get(id(model))
+
+
+# Blocking generation through the shared scheduler, returns the full text and its timings.
+# timings["truncated"] is set when the text was cut off at max_output_tokens.
+def generate_text(model, prompt, user=None, **options):
+    start = time.perf_counter()
+    finish = {}
+    text = get_scheduler().generate(model, prompt, api_key=model_key(model), user=user, finish=finish, **options)
+    total = time.perf_counter() - start
+    return text, {"ttft": total, "total": total, "streamed": False, "cancelled": False, "truncated": finish["truncated"]}
+
+
+# Several candidates from one request (generation_config candidate_count), returns the texts and
+# timings, with timings["truncated"] holding one flag per candidate
+def generate_candidates(model, prompt, user=None, **options):
+    start = time.perf_counter()
+    finish = {}
+    texts = get_scheduler().generate(model, prompt, api_key=model_key(model), user=user, candidates=True, finish=finish, **options)
+    total = time.perf_counter() - start
+    return texts, {"ttft": total, "total": total, "streamed": False, "cancelled": False, "truncated": finish["truncated"]}
+
+
+# Streaming generation, yields text chunks as they arrive and fills in timings.
+# If the consumer stops iterating (Stop button, rerun), the request is marked cancelled.
+def stream_text(model, prompt, timings, user=None, **options):
+    start = time.perf_counter()
+    timings.update({"ttft": None, "total": None, "streamed": True, "cancelled": True, "truncated": False})
+    try:
+        for text in get_scheduler().stream(model, prompt, api_key=model_key(model), user=user, finish=timings, **options):
+            if timings["ttft"] is None:
+                timings["ttft"] = time.perf_counter() - start
+            yield text
+        timings["cancelled"] = False
+    finally:
+        timings["total"] = time.perf_counter() - start
+
+
+# Rough token count: about 4 bytes of UTF-8 per token, which errs high for non-Latin scripts
+def estimate_tokens(text):
+    return -(-len(text.encode('utf-8')) // 4)
+
+
+# Prompt size for the preflight check, from the API (through the scheduler) when PROMPT_TOKEN_COUNTER=api
+def count_prompt_tokens(model, prompt):
+    if PROMPT_TOKEN_COUNTER == "api" and hasattr(model, "count_tokens"):
+        try:
+            return get_scheduler().count_tokens(model, prompt, api_key=model_key(model))
+        except Exception:
+            pass  # counting is advisory, fall back to the estimate
+    return estimate_tokens(prompt)
+
+
+# Build a prompt from a template and its free-text field, cutting the end of the field off when
+# the whole prompt would go over the limit. Returns the prompt and whether it was trimmed.
+def fit_prompt(build, text, limit=MAX_PROMPT_TOKENS):
+    prompt = build(text)
+    overflow = estimate_tokens(prompt) - limit
+    if overflow <= 0 or not text:
+        return prompt, False
+    encoded = text.encode('utf-8')
+    keep = max(0, len(encoded) - overflow * 4 - len(TRIM_MARKER.encode('utf-8')))
+    return build(encoded[:keep].decode('utf-8', 'ignore').rstrip() + TRIM_MARKER), True
@@ -0,0 +1,75 @@
+import json
+import time
+
+from auth import get_pool
+
+PAGE_SIZE = 20
+
+
+# History table in users.db plus an external-content FTS5 index kept in sync by triggers
+def init_history():
+    with get_pool().connection() as conn:
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                feature TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                output TEXT NOT NULL,
+                model TEXT NOT NULL,
+                timings TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS history_user_id ON history (username, id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+                prompt, output, content='history', content_rowid='id'
+            );
+            CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN
+                INSERT INTO history_fts (rowid, prompt, output) VALUES (new.id, new.prompt, new.output);
+            END;
+            CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history BEGIN
+                INSERT INTO history_fts (history_fts, rowid, prompt, output) VALUES ('delete', old.id, old.prompt, old.output);
+            END;
+        ''')
+        conn.commit()
+
+
+def save_generation(username, feature, prompt, settings, output, model, timings):
+    with get_pool().connection() as conn:
+        cur = conn.execute(
+            "INSERT INTO history (username, feature, prompt, settings, output, model, timings, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (username, feature, prompt, json.dumps(settings or {}), output, model, json.dumps(timings or {}), time.time()))
+        conn.commit()
+        return cur.lastrowid
+
+
+# Turn free text into an FTS5 query of quoted prefix terms, so user input can't break the syntax
+def _match_query(text):
+    return " ".join('"' + term.replace('"', '""') + '"*' for term in text.split())
+
+
+def _rows(cursor):
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+# One page of a user's history, newest first. Keyset pagination: pass the last id of the
+# previous page as before_id, so deep pages cost the same as the first one.
+def list_history(username, before_id=None, limit=PAGE_SIZE, query=None):
+    params = [username]
+    if query and query.strip():
+        sql = '''SELECT h.id, h.feature, h.prompt, h.output, h.model, h.created_at
+                 FROM history_fts JOIN history h ON h.id = history_fts.rowid
+                 WHERE history_fts MATCH ? AND h.username = ?'''
+        params.insert(0, _match_query(query))
+    else:
+        sql = '''SELECT h.id, h.feature, h.prompt, h.output, h.model, h.created_at
+                 FROM history h WHERE h.username = ?'''
+    if before_id is not None:
+        sql += " AND h.id < ?"
+        params.append(before_id)
+    sql += " ORDER BY h.id DESC LIMIT ?"
+    params.append(limit)
+    with get_pool().connection() as conn:
+        return _rows(conn.execute(sql, params))
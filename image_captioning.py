@@ -0,0 +1,63 @@
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from generation import generate_text
+from metrics import submit
+from scheduler import user_pool
+
+CAPTION_PROMPT = "Write a caption for the image in english"
+TAGS_PROMPT = "Generate 5 hash tags for the image in a line in english"
+DESCRIPTION_PROMPT = "Generate description for the image without mentioning like here is the description"
+
+STRUCTURED_PROMPT = """Analyze the image and answer in english with a single JSON object and nothing else, using exactly these keys:
+- "caption": a short caption for the image
+- "tags": a list of exactly 5 hash tags for the image, each starting with #
+- "description": a description of the image without mentioning like here is the description"""
+
+
+# Parse and validate the structured JSON answer, raises ValueError if it is unusable
+def parse_result(text):
+    text = text.strip()
+    fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1)
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+
+    caption = data.get("caption")
+    description = data.get("description")
+    tags = data.get("tags")
+    if not isinstance(caption, str) or not caption.strip():
+        raise ValueError("Missing caption")
+    if not isinstance(description, str) or not description.strip():
+        raise ValueError("Missing description")
+    if isinstance(tags, str):
+        tags = tags.split()
+    if not isinstance(tags, list) or not tags or not all(isinstance(tag, str) for tag in tags):
+        raise ValueError("Missing tags")
+
+    tags = ["#" + tag.strip().lstrip("#").replace(" ", "") for tag in tags if tag.strip().lstrip("#")]
+    return {"caption": caption.strip(), "tags": " ".join(tags[:5]), "description": description.strip()}
+
+
+# Old three-prompt behaviour, but the calls run concurrently instead of one after another
+def caption_image_fallback(model, img, user=None):
+    prompts = {"caption": CAPTION_PROMPT, "tags": TAGS_PROMPT, "description": DESCRIPTION_PROMPT}
+    # The three prompts count against the user's sub-call pool, so they run at once rather than
+    # queueing on the general per-user cap
+    with ThreadPoolExecutor(max_workers=len(prompts)) as pool, user_pool("subcalls"):
+        futures = {name: submit(pool, generate_text, model, [prompt, img], user) for name, prompt in prompts.items()}
+        return {name: future.result()[0].strip() for name, future in futures.items()}
+
+
+# Caption, tags and description from one multimodal request, falling back on bad JSON or on a
+# response with no text (response.text raises ValueError when the answer was blocked or empty)
+def caption_image(model, img, user=None):
+    try:
+        text, _ = generate_text(model, [STRUCTURED_PROMPT, img], user,
+                                generation_config={"response_mime_type": "application/json"})
+        return parse_result(text)
+    except ValueError:
+        return caption_image_fallback(model, img, user)
@@ -0,0 +1,39 @@
+import hashlib
+import io
+import os
+
+from PIL import Image, ImageOps
+
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+
+
+# An uploaded image after decoding, downscaling and re-encoding, ready to send to the model
+class PreparedImage:
+    def __init__(self, data, digest, original_size, size):
+        self.data = data
+        self.digest = digest
+        self.original_size = original_size
+        self.size = size
+
+    # Inline blob part accepted by generate_content alongside text prompts
+    def as_part(self):
+        return {"mime_type": "image/jpeg", "data": self.data}
+
+
+# Content hash of the raw upload, used to dedupe re-uploads of the same image
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+# Decode straight from the uploaded bytes, downscale to max_edge and re-encode as JPEG
+def prepare_image(data, max_edge=IMAGE_MAX_EDGE, quality=IMAGE_QUALITY):
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        original_size = img.size
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=quality, optimize=True)
+        return PreparedImage(buffer.getvalue(), content_hash(data), original_size, img.size)
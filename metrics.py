@@ -0,0 +1,235 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+
+METRICS_LOG = os.getenv("METRICS_LOG", os.path.join("logs", "requests.jsonl"))
+METRICS_LOG_MAX_BYTES = int(os.getenv("METRICS_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+METRICS_LOG_BACKUPS = int(os.getenv("METRICS_LOG_BACKUPS", "5"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464") or 0)
+# Loopback by default; set to 0.0.0.0 to let a scraper on another host reach /metrics
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current = contextvars.ContextVar("metrics_request", default=None)
+# Stages timed just before a request starts (e.g. prompt assembly) are attached to it
+_pending = contextvars.ContextVar("metrics_pending", default=None)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# In-process metrics in Prometheus text exposition format
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, name, labels, value):
+        with self.lock:
+            key = (name, tuple(sorted(labels.items())))
+            self.histograms.setdefault(key, Histogram()).observe(value)
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            key = (name, tuple(sorted(labels.items())))
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def render(self):
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+        lines = []
+        with self.lock:
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, labels), hist in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(BUCKETS, hist.counts):
+                        lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {count}")
+                    lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {hist.count}")
+                    lines.append(f"{name}_sum{fmt(labels)} {hist.sum}")
+                    lines.append(f"{name}_count{fmt(labels)} {hist.count}")
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{fmt(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+_log = logging.getLogger("smart_content_studio.requests")
+_log.propagate = False
+_log_lock = threading.Lock()
+
+
+def _write_log(record):
+    with _log_lock:
+        if not _log.handlers:
+            os.makedirs(os.path.dirname(METRICS_LOG) or ".", exist_ok=True)
+            handler = RotatingFileHandler(METRICS_LOG, maxBytes=METRICS_LOG_MAX_BYTES,
+                                          backupCount=METRICS_LOG_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _log.addHandler(handler)
+            _log.setLevel(logging.INFO)
+    _log.info(json.dumps(record, ensure_ascii=False))
+
+
+# Add time measured elsewhere to one stage of the current request. Outside a request the latest
+# timing of each stage is held and attached to the next request started in the same context
+# (prompt assembly runs before the Submit check on every rerun, so only the last one belongs to it).
+def record_span(name, elapsed):
+    record = _current.get()
+    if record is not None:
+        # Worker threads (caption fallback, thread summaries) add to the same record
+        with registry.lock:
+            record["spans"][name] = record["spans"].get(name, 0.0) + elapsed
+        registry.observe("scs_stage_duration_seconds", {"stage": name}, elapsed)
+    else:
+        _pending.set(dict(_pending.get() or {}, **{name: elapsed}))
+
+
+# Time one stage of the current request
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+# Current request's record, for adding the model name, cache status and so on
+def current():
+    return _current.get()
+
+
+# pool.submit that runs fn in a copy of the caller's context, so calls made on the worker thread
+# count against the current request's metrics (and the caller's scheduler user pool)
+def submit(pool, fn, *args):
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+
+# Token counts from a response's usage metadata, added to the current request
+def record_usage(response):
+    record = _current.get()
+    usage = getattr(response, "usage_metadata", None)
+    if record is None or usage is None:
+        return
+    with registry.lock:
+        record["prompt_tokens"] += getattr(usage, "prompt_token_count", 0) or 0
+        record["response_tokens"] += getattr(usage, "candidates_token_count", 0) or 0
+
+
+# One record per user request: spans, tokens, model, feature and cache status. On exit it is
+# written to the rotating JSONL log and folded into the Prometheus metrics. Inside another
+# tracked request it yields that request's record instead of starting a new one.
+@contextmanager
+def track_request(feature, model=None, user=None):
+    outer = _current.get()
+    if outer is not None:
+        # Nested tracking (the UI around a core call) adds to the request already in progress
+        outer["model"] = outer["model"] or model
+        outer["user"] = outer["user"] or user
+        yield outer
+        return
+    record = {"ts": time.time(), "feature": feature, "model": model, "user": user, "cache": None,
+              "status": "ok", "prompt_tokens": 0, "response_tokens": 0, "spans": dict(_pending.get() or {})}
+    record["adopted"] = set(record["spans"])
+    _pending.set(None)
+    token = _current.set(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = type(e).__name__
+        raise
+    except BaseException:
+        # Streamlit stops the script with a BaseException on rerun, i.e. the user cancelled
+        record["status"] = "cancelled"
+        raise
+    finally:
+        _current.reset(token)
+        record["duration"] = time.perf_counter() - start
+        _finish(record)
+
+
+def _finish(record):
+    for name, elapsed in record["spans"].items():
+        if name in record["adopted"]:
+            registry.observe("scs_stage_duration_seconds", {"stage": name}, elapsed)
+    del record["adopted"]
+    labels = {"feature": record["feature"], "model": record["model"] or ""}
+    registry.observe("scs_request_duration_seconds", labels, record["duration"])
+    registry.inc("scs_requests_total", dict(labels, cache=record["cache"] or "none", status=record["status"]))
+    if record["prompt_tokens"]:
+        registry.inc("scs_tokens_total", dict(labels, direction="prompt"), record["prompt_tokens"])
+    if record["response_tokens"]:
+        registry.inc("scs_tokens_total", dict(labels, direction="response"), record["response_tokens"])
+    try:
+        _write_log(record)
+    except OSError:
+        logging.getLogger(__name__).exception("Could not write request log")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+# Serve /metrics on METRICS_HOST:METRICS_PORT from a daemon thread, once per process (port 0 disables it)
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    global _server
+    with _server_lock:
+        if _server is not None or not port:
+            return _server
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError:
+            logging.getLogger(__name__).warning("Metrics port %s is in use, /metrics not served", port)
+            return None
+        threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        return _server
@@ -0,0 +1,114 @@
+# Prompt templates shared by the Streamlit forms and bulk generation
+import os
+import re
+
+
+# Essay Generation
+def essay_prompt(topic, length, additional):
+    return f"""Write an essay that is on topic - {topic} with a {length} tone. Here are some additional points regarding this - {additional}. Structure your essay with a clear introduction, body paragraphs that support your thesis, and a strong conclusion. Use evidence and examples to illustrate your points. Ensure your writing is clear, concise, and engaging. Pay attention to tone given above, grammar, spelling, and punctuation. Most important, give me essay {length} long."""
+
+
+# Email Generation - Compose
+def compose_email_prompt(sender, receiver, subject, purpose, length, tone, language):
+    return f"""Compose a professional email with a tone appropriate for the purpose of {purpose}. **To:** {receiver} **From:** {sender} **Subject:** {subject}
+    **Body:**
+    Begin the email with a friendly and appropriate greeting, addressing the recipient by name.
+    Clearly state the purpose of the email in the first sentence or two.
+    Provide concise and relevant information related to the purpose, using a clear and easy-to-read format.
+    Structure the body paragraphs logically, using bullet points or numbered lists if necessary.
+    Very important Maintain a {tone} throughout the email.
+    **Closing:**
+    End the email with a polite closing phrase, such as "Sincerely," "Best regards," or "Thank you."
+    Include the sender's full name and contact information (email address, phone number, etc.) below the closing.
+    **Additional details:**
+    - Proofread the email carefully before sending to ensure accuracy and clarity.
+    - The email length must be {length} and give me in language {language}."""
+
+
+# Email Generation - Reply
+def reply_email_prompt(sender, receiver, received, subject, purpose, length, tone, language):
+    return f"""**Analyze the following email received from {receiver} and generate a suitable response for {sender}:**
+    **Subject:** {subject}
+    **Body:** {received}
+    **Context and Purpose:**
+    * **Purpose of the email:** {purpose}
+    * **Desired tone of the reply:** {tone}
+    **Specific Points and Instructions:**
+    * **Key issues or requests raised by the sender:** Briefly summarize the main points the sender wants to address.
+    * **Specific questions to answer:** List any specific questions you need to answer in the reply.
+    * **Desired action or outcome:** What do you want to achieve with your reply? (e.g., Schedule a meeting, provide information, address concerns)
+    **Reply Generation:**
+    * **Generate a reply that is:**
+        * Clear, concise, and {tone} tone
+        * Start the email with a polite phrase as per the post of receiver (e.g., Respected, Dear, etc.)
+        * Consistent with the tone of the original email
+        * Addresses the sender's concerns or requests
+        * Takes the appropriate action based on the purpose of the email
+    **I look forward to assisting you in crafting the perfect email response in language {language} and reply must have length {length}!"""
+
+
+# Post Generation - Linkedin
+def linkedin_post_prompt(style, length, domain, description):
+    return f"""**Craft a LinkedIn post that captures attention and sparks conversations.**
+    **Imagine you're a skilled storyteller, weaving a captivating narrative that blends:**
+    - A {style} tone, resonating with your audience's emotions and values.
+    - A length of approximately {length} words, delivering your message concisely and impactfully.
+    - I work in the domain of {domain}.
+    - These key elements, handpicked to shape your story: {description}
+
+    **Guidelines for your masterpiece:**
+
+    - **Paint a vivid picture:** Use descriptive language and maintain post tone like {style}.
+    - **Add Emoji to make post more attractive**
+    - **Weave in relevant keywords and hashtags:** Enhance visibility and reach within your professional network.
+    - **Polish your prose to perfection:** Ensure clarity, conciseness, and flawless grammar.
+    **Now, Bard, unleash your creativity and craft a LinkedIn post that resonates, inspires, and leaves a lasting impression!**"""
+
+
+# Post Generation - Twitter/X
+def twitter_post_prompt(style, length, description):
+    return f"""Prompt for generating Twitter posts that capture human-like creativity and authenticity.
+    Template:
+    Write a tweet that is {style} in tone, {length} characters long, and incorporates the following elements:
+    * {description}
+    Ensure the tweet is:
+    * Engaging and attention-grabbing
+    * Clear and concise
+    * Likely to resonate with their audience
+    * Add Mentions if possible and must add tags at the end
+    Feel free to use creative language, wordplay, humor, or other techniques to make the tweet stand out.
+    """
+
+
+# Output budget for the length selectors. The prompts ask for a word count; max_output_tokens
+# enforces it with room for the model to finish its last sentence.
+TOKENS_PER_WORD = 1.4
+LENGTH_HEADROOM = 1.3
+EXTENSIVE_WORDS = 1200
+TEXT_MAX_OUTPUT_TOKENS = int(os.getenv("TEXT_MAX_OUTPUT_TOKENS", "2048"))
+# Most output tokens each text model will produce; max_output_tokens is clamped to these
+MODEL_OUTPUT_LIMITS = {"gemini-pro": 2048, "gemini-1.0-pro": 2048, "gemini-1.5-flash": 8192, "gemini-1.5-pro": 8192}
+DEFAULT_OUTPUT_LIMIT = int(os.getenv("MODEL_OUTPUT_LIMIT", "2048"))
+TEMPERATURES = {"essay": 0.7, "email": 0.4, "linkedin": 0.9, "twitter": 1.0, "text": 0.9}
+# Scripts that take more tokens per word than English
+LANGUAGE_TOKEN_FACTOR = {"Arabic": 2.0, "Bengali": 3.0, "Bulgarian": 1.8, "Chinese simplified": 1.5, "Hindi": 3.0}
+
+
+# Word count from a length option such as "medium - approx 350 words"
+def length_words(length):
+    if length.startswith("extensive"):
+        return EXTENSIVE_WORDS
+    match = re.search(r"(\d+)\s*words", length)
+    return int(match.group(1)) if match else None
+
+
+# generation_config for a feature ("essay", "email", "linkedin", "twitter", "text") and length
+# option, with max_output_tokens kept within what the model can produce
+def length_config(kind, length=None, language=None, model=None):
+    words = length_words(length) if length else None
+    if words is None:
+        max_tokens = TEXT_MAX_OUTPUT_TOKENS
+    else:
+        max_tokens = int(words * TOKENS_PER_WORD * LANGUAGE_TOKEN_FACTOR.get(language, 1.0) * LENGTH_HEADROOM)
+    limit = MODEL_OUTPUT_LIMITS.get((model or "").split("/")[-1], DEFAULT_OUTPUT_LIMIT)
+    return {"max_output_tokens": min(max_tokens, limit), "temperature": TEMPERATURES[kind]}
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DB = os.getenv("CACHE_DB", "cache.db")
+MEMORY_ENTRIES = int(os.getenv("CACHE_MEMORY_ENTRIES", "256"))
+DISK_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+DISK_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+
+# Cache key from the model name, the prompt with whitespace collapsed and the generation settings
+def make_key(model_name, prompt, settings=None):
+    normalized = " ".join(str(prompt).split())
+    payload = json.dumps([model_name, normalized, settings or {}], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# First tier: bounded in-process LRU shared by every session. Entries expire with the disk
+# copy they came from, so a hot entry isn't served from memory past the TTL.
+class MemoryLRU:
+    def __init__(self, maxsize=MEMORY_ENTRIES, ttl=DISK_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            expires_at, value = self.entries[key]
+            if time.time() > expires_at:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, expires_at=None):
+        with self.lock:
+            self.entries[key] = (expires_at or time.time() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+
+# Second tier: SQLite file next to users.db with TTL and size-based eviction
+class DiskCache:
+    def __init__(self, path=CACHE_DB, ttl=DISK_TTL_SECONDS, max_bytes=DISK_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    latency REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                    )''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT response, latency, created_at FROM responses WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[2] > self.ttl:
+                self.conn.execute("DELETE FROM responses WHERE key=?", (key,))
+                self.conn.commit()
+                return None
+            self.conn.execute("UPDATE responses SET last_used=? WHERE key=?", (now, key))
+            self.conn.commit()
+        return row[0], row[1], row[2] + self.ttl
+
+    def put(self, key, model_name, text, latency):
+        now = time.time()
+        size = len(text.encode('utf-8'))
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              (key, model_name, text, latency, size, now, now))
+            self.conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                # Drop least recently used rows until we are back under the limit
+                rows = self.conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall()
+                for old_key, old_size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    self.conn.execute("DELETE FROM responses WHERE key=?", (old_key,))
+                    total -= old_size
+            self.conn.commit()
+
+
+# Both tiers together plus hit/miss counters
+class ResponseCache:
+    def __init__(self, memory=None, disk=None):
+        self.memory = memory or MemoryLRU()
+        self.disk = disk or DiskCache()
+        self.lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "saved_seconds": 0.0}
+
+    def _count(self, name, saved=0.0):
+        with self.lock:
+            self.stats[name] += 1
+            self.stats["saved_seconds"] += saved
+
+    # Returns (text, tier) where tier is 'memory', 'disk' or None on a miss
+    def get(self, key):
+        entry = self.memory.get(key)
+        if entry is not None:
+            self._count("memory_hits", entry[1])
+            return entry[0], 'memory'
+        entry = self.disk.get(key)
+        if entry is not None:
+            text, latency, expires_at = entry
+            self.memory.put(key, (text, latency), expires_at)
+            self._count("disk_hits", latency)
+            return text, 'disk'
+        self._count("misses")
+        return None, None
+
+    def put(self, key, model_name, text, latency):
+        self.memory.put(key, (text, latency), time.time() + self.disk.ttl)
+        self.disk.put(key, model_name, text, latency)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# Process-wide cache shared by every Streamlit session
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
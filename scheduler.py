@@ -0,0 +1,305 @@
+import contextvars
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from metrics import stage, record_span, record_usage
+
+KEY_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_KEY_RPM", "60"))
+MODEL_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_MODEL_RPM", "60"))
+BURST = int(os.getenv("GEMINI_BURST", "5"))
+USER_CONCURRENCY = int(os.getenv("GEMINI_USER_CONCURRENCY", "2"))
+# Separate per-user cap for the outputs of one fan-out (Compare options), so they run side by
+# side without lifting the cap on everything else a user does
+FANOUT_USER_CONCURRENCY = int(os.getenv("GEMINI_FANOUT_USER_CONCURRENCY", "4"))
+# Per-user cap for the sub-calls one request makes at once (caption fallback prompts, thread
+# summaries), which would otherwise queue behind each other under USER_CONCURRENCY
+SUBCALL_USER_CONCURRENCY = int(os.getenv("GEMINI_SUBCALL_USER_CONCURRENCY", "4"))
+MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "4"))
+BACKOFF_BASE_SECONDS = float(os.getenv("GEMINI_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX_SECONDS = float(os.getenv("GEMINI_BACKOFF_MAX", "30.0"))
+
+# google.api_core exception names worth retrying (quota, overload, transient server errors)
+RETRYABLE_ERRORS = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+                    "DeadlineExceeded", "GatewayTimeout"}
+RETRYABLE_CODES = {429, 500, 503, 504}
+
+
+def is_retryable(error):
+    return type(error).__name__ in RETRYABLE_ERRORS or getattr(error, "code", None) in RETRYABLE_CODES
+
+
+def is_quota_error(error):
+    return type(error).__name__ in ("ResourceExhausted", "TooManyRequests") or getattr(error, "code", None) == 429
+
+
+# Text of every candidate in a response (response.text only works when there is one)
+def candidate_texts(response):
+    return ["".join(part.text for part in candidate.content.parts) for candidate in response.candidates]
+
+
+# Whether a candidate stopped because it reached max_output_tokens, i.e. its text is cut off
+def hit_token_limit(candidate):
+    reason = getattr(candidate, "finish_reason", None)
+    return getattr(reason, "name", reason) == "MAX_TOKENS"
+
+
+# Classic token bucket: refills at rate_per_minute, allows bursts up to capacity
+class TokenBucket:
+    def __init__(self, rate_per_minute, capacity=BURST):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Per-user concurrency pool that calls made in the current context count against
+_user_pool = contextvars.ContextVar("scheduler_user_pool", default="default")
+USER_POOL_SIZES = {"default": USER_CONCURRENCY, "fanout": FANOUT_USER_CONCURRENCY, "subcalls": SUBCALL_USER_CONCURRENCY}
+
+
+# Count the calls made inside the block against another per-user pool, e.g. user_pool("fanout")
+@contextmanager
+def user_pool(name):
+    token = _user_pool.set(name)
+    try:
+        yield
+    finally:
+        _user_pool.reset(token)
+
+
+# Raised to followers when the request they were waiting on was cancelled by its own session
+class _LeaderCancelled(Exception):
+    pass
+
+
+# Stable identity for request contents and call mode ("text", "candidates" or "stream"); inline
+# image blobs are hashed rather than serialized
+def _flight_key(api_key, model_name, contents, options, mode):
+    parts = contents if isinstance(contents, list) else [contents]
+    serialized = []
+    for part in parts:
+        if isinstance(part, dict) and "data" in part:
+            serialized.append({"mime_type": part.get("mime_type"), "sha256": hashlib.sha256(part["data"]).hexdigest()})
+        else:
+            serialized.append(str(part))
+    payload = json.dumps([hashlib.sha256((api_key or "").encode('utf-8')).hexdigest(), model_name, serialized, options, mode],
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# Shared front door for every generate_content call: per-key and per-model rate limits,
+# per-user concurrency caps, retries with backoff, and coalescing of identical in-flight requests
+class Scheduler:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.user_slots = {}
+        self.flights = {}
+        self.stats = {"calls": 0, "coalesced": 0, "retries": 0}
+
+    def _bucket(self, key, rate):
+        with self.lock:
+            if key not in self.buckets:
+                self.buckets[key] = TokenBucket(rate)
+            return self.buckets[key]
+
+    def _user_slot(self, user):
+        pool = _user_pool.get()
+        with self.lock:
+            if (user, pool) not in self.user_slots:
+                self.user_slots[(user, pool)] = threading.BoundedSemaphore(USER_POOL_SIZES[pool])
+            return self.user_slots[(user, pool)]
+
+    def _count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def _wait_for_quota(self, api_key, model_name):
+        self._bucket(("key", api_key), KEY_REQUESTS_PER_MINUTE).acquire()
+        self._bucket(("model", api_key, model_name), MODEL_REQUESTS_PER_MINUTE).acquire()
+
+    def _backoff(self, attempt):
+        self._count("retries")
+        # Full jitter keeps retrying sessions from stampeding the API together
+        time.sleep(random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)))
+
+    # Join an identical in-flight request if there is one, otherwise become its leader
+    def _join(self, key):
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self.flights[key] = Future()
+            return flight, True
+
+    def _finish(self, key, flight, result=None, error=None):
+        with self.lock:
+            self.flights.pop(key, None)
+        if error is not None:
+            flight.set_exception(error)
+        else:
+            flight.set_result(result)
+
+    # Blocking call, returns the response text, or a list of texts with candidates=True
+    # (for generation_config candidate_count > 1). finish, when given, gets "truncated": whether
+    # the answer was cut off at max_output_tokens (a list, one per candidate, with candidates=True).
+    def generate(self, model, contents, api_key=None, user=None, candidates=False, finish=None, **options):
+        key = _flight_key(api_key, model.model_name, contents, options, "candidates" if candidates else "text")
+        while True:
+            flight, leader = self._join(key)
+            if not leader:
+                self._count("coalesced")
+                try:
+                    text, truncated = flight.result()
+                except _LeaderCancelled:
+                    continue
+                break
+            try:
+                text, truncated = self._call(model, contents, api_key, user, options, candidates)
+            except BaseException as e:
+                self._finish(key, flight, error=e if isinstance(e, Exception) else _LeaderCancelled())
+                raise
+            self._finish(key, flight, (text, truncated))
+            break
+        if finish is not None:
+            finish["truncated"] = truncated
+        return text
+
+    def _call(self, model, contents, api_key, user, options, candidates=False):
+        slot = self._user_slot(user) if user else None
+        if slot:
+            slot.acquire()
+        try:
+            for attempt in range(MAX_RETRIES + 1):
+                self._wait_for_quota(api_key, model.model_name)
+                self._count("calls")
+                try:
+                    with stage("generate_content"):
+                        response = model.generate_content(contents, **options)
+                    record_usage(response)
+                    if candidates:
+                        return candidate_texts(response), [hit_token_limit(candidate) for candidate in response.candidates]
+                    return response.text, hit_token_limit(response.candidates[0])
+                except Exception as e:
+                    if attempt == MAX_RETRIES or not is_retryable(e):
+                        raise
+                    self._backoff(attempt)
+        finally:
+            if slot:
+                slot.release()
+
+    # Prompt size from the model's count_tokens, under the same rate limits and retries as generation
+    def count_tokens(self, model, contents, api_key=None):
+        for attempt in range(MAX_RETRIES + 1):
+            self._wait_for_quota(api_key, model.model_name)
+            self._count("calls")
+            try:
+                return model.count_tokens(contents).total_tokens
+            except Exception as e:
+                if attempt == MAX_RETRIES or not is_retryable(e):
+                    raise
+                self._backoff(attempt)
+
+    # Streaming call, yields text chunks. Followers of an identical in-flight request get its
+    # full text in one chunk once it finishes. Retries only happen before the first chunk.
+    # finish, when given, gets "truncated" once the stream ends.
+    def stream(self, model, contents, api_key=None, user=None, finish=None, **options):
+        key = _flight_key(api_key, model.model_name, contents, options, "stream")
+        while True:
+            flight, leader = self._join(key)
+            if not leader:
+                self._count("coalesced")
+                try:
+                    text, truncated = flight.result()
+                except _LeaderCancelled:
+                    continue
+                if finish is not None:
+                    finish["truncated"] = truncated
+                yield text
+                return
+            break
+
+        slot = self._user_slot(user) if user else None
+        if slot:
+            slot.acquire()
+        chunks = []
+        truncated = False
+        # Anything that ends the stream without an answer (consumer closed it, Streamlit stopped
+        # the script) lets the followers retry instead of leaving them waiting
+        error = _LeaderCancelled()
+        try:
+            for attempt in range(MAX_RETRIES + 1):
+                self._wait_for_quota(api_key, model.model_name)
+                self._count("calls")
+                # Only the waits on the model count as generate_content, not the time the consumer
+                # spends rendering each chunk in between
+                upstream = 0.0
+                try:
+                    chunk = None
+                    start = time.perf_counter()
+                    responses = iter(model.generate_content(contents, stream=True, **options))
+                    while True:
+                        try:
+                            response = next(responses, None)
+                        finally:
+                            upstream += time.perf_counter() - start
+                        if response is None:
+                            break
+                        chunk = response
+                        text = chunk.text
+                        if text:
+                            chunks.append(text)
+                            yield text
+                        start = time.perf_counter()
+                    # The last chunk carries the usage metadata and finish reason for the whole response
+                    record_usage(chunk)
+                    truncated = chunk is not None and bool(chunk.candidates) and hit_token_limit(chunk.candidates[0])
+                    if finish is not None:
+                        finish["truncated"] = truncated
+                    break
+                except Exception as e:
+                    if chunks or attempt == MAX_RETRIES or not is_retryable(e):
+                        raise
+                    self._backoff(attempt)
+                finally:
+                    record_span("generate_content", upstream)
+            error = None
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if slot:
+                slot.release()
+            self._finish(key, flight, ("".join(chunks), truncated), error)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+# Process-wide scheduler shared by every Streamlit session
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
@@ -0,0 +1,118 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_thread import clean_message, split_messages
+
+
+def test_quoted_reply_becomes_its_own_message():
+    thread = """Thanks, Friday works for me.
+
+On Mon, Jan 6, 2025 at 9:00 AM Bob <bob@example.com> wrote:
+> Can we move the review to Friday?
+>
+> Bob"""
+    assert split_messages(thread) == ["Thanks, Friday works for me.", "Can we move the review to Friday?\n\nBob"]
+
+
+def test_nested_quotes_and_repeated_copies_are_kept_once():
+    thread = """Sounds good.
+
+On Tue, Jan 7, 2025 at 10:00 AM Ann <ann@example.com> wrote:
+> Friday it is.
+>
+> On Mon, Jan 6, 2025 at 9:00 AM Bob <bob@example.com> wrote:
+>> Can we move the review to Friday?
+
+On Mon, Jan 6, 2025 at 9:00 AM Bob <bob@example.com> wrote:
+> Can we move the review to Friday?"""
+    assert split_messages(thread) == ["Sounds good.", "Friday it is.", "Can we move the review to Friday?"]
+
+
+def test_outlook_header_block_starts_a_message_and_is_dropped():
+    thread = """See the numbers attached.
+
+From: Bob Smith <bob@example.com>
+Sent: Monday, January 6, 2025 9:00 AM
+To: Ann Lee <ann@example.com>
+Subject: Q1 budget
+
+Can you send the Q1 numbers?"""
+    assert split_messages(thread) == ["See the numbers attached.", "Can you send the Q1 numbers?"]
+
+
+def test_outlook_rule_line_before_header_block():
+    thread = """See the numbers attached.
+
+________________________________
+From: Bob Smith <bob@example.com>
+Sent: Monday, January 6, 2025 9:00 AM
+Subject: Q1 budget
+
+Can you send the Q1 numbers?"""
+    assert split_messages(thread) == ["See the numbers attached.", "Can you send the Q1 numbers?"]
+
+
+def test_forwarded_message_headers_are_dropped():
+    thread = """FYI below.
+
+---------- Forwarded message ---------
+From: Bob <bob@example.com>
+Date: Mon, Jan 6, 2025
+Subject: Launch
+
+The launch moved to March."""
+    assert split_messages(thread) == ["FYI below.", "The launch moved to March."]
+
+
+def test_header_like_lines_inside_a_body_are_kept():
+    thread = """Quick update for everyone:
+Subject: budget review moved to Friday
+From: next week we meet in room 4.
+
+Subject: the offsite is cancelled."""
+    assert split_messages(thread) == [thread]
+
+
+def test_signature_is_removed():
+    message = """Let's meet at 3pm.
+
+Best,
+Ann
+--
+Ann Lee | Product Manager
++1 555 0100"""
+    assert clean_message(message) == "Let's meet at 3pm.\n\nBest,\nAnn"
+
+
+def test_mobile_signature_is_removed():
+    assert clean_message("On my way.\n\nSent from my iPhone") == "On my way."
+
+
+def test_trailing_disclaimer_is_removed_but_body_prose_is_kept():
+    message = """The contract is confidential and privileged, so please don't forward it yet.
+
+I'll send the signed copy tomorrow.
+
+This email is confidential and intended solely for the use of the addressee. If you are not the intended recipient, please delete it."""
+    assert clean_message(message) == ("The contract is confidential and privileged, so please don't forward it yet.\n\n"
+                                      "I'll send the signed copy tomorrow.")
+
+
+def test_rule_line_inside_a_body_is_kept():
+    assert clean_message("Steps:\n--\nrun the job\nthen check") == "Steps:\n--\nrun the job\nthen check"
+
+
+def test_standard_signature_delimiter_without_sign_off_is_removed():
+    assert clean_message("Let's meet at 3pm.\n\n-- \nAnn Lee\n+1 555 0100") == "Let's meet at 3pm."
+
+
+def test_header_lines_need_header_like_values():
+    thread = """Agenda below.
+
+From: the finance side, numbers are final.
+To: do list is attached.
+
+Thanks"""
+    assert split_messages(thread) == ["Agenda below.\n\nFrom: the finance side, numbers are final.\nTo: do list is attached.\n\nThanks"]
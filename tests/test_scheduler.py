@@ -0,0 +1,174 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scheduler
+from backends import FakeModel, ResourceExhausted
+from scheduler import Scheduler, user_pool
+
+
+# Fake model whose calls wait on a gate, so a test decides when the in-flight request finishes.
+# Tracks how many calls run at once and can fail the first few calls with a 429.
+class GatedModel(FakeModel):
+    def __init__(self, failures=0):
+        super().__init__("gemini-pro", latency_ms=0, tokens_per_second=1e6, output_tokens=20)
+        self.gate = threading.Event()
+        self.entered = threading.Event()
+        self.failures = failures
+        self.running = 0
+        self.peak = 0
+        self.counter = threading.Lock()
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        with self.counter:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            failing = self.failures > 0
+            self.failures -= failing
+        try:
+            self.entered.set()
+            self.gate.wait(5)
+            if failing:
+                raise ResourceExhausted("429 Resource has been exhausted")
+            return super().generate_content(contents, stream=stream, **kwargs)
+        finally:
+            with self.counter:
+                self.running -= 1
+
+
+@pytest.fixture(autouse=True)
+def fast_limits(monkeypatch):
+    # Quota and backoff are not under test here; keep them out of the way
+    monkeypatch.setattr(scheduler, "KEY_REQUESTS_PER_MINUTE", 60000)
+    monkeypatch.setattr(scheduler, "MODEL_REQUESTS_PER_MINUTE", 60000)
+    monkeypatch.setattr(scheduler, "BACKOFF_BASE_SECONDS", 0.0)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def in_thread(fn, *args):
+    result = {}
+
+    def run():
+        try:
+            result["value"] = fn(*args)
+        except Exception as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, result
+
+
+def test_identical_requests_are_coalesced():
+    s, model = Scheduler(), GatedModel()
+    leader, first = in_thread(s.generate, model, "hello", "key")
+    model.entered.wait(5)
+    follower, second = in_thread(s.generate, model, "hello", "key")
+    wait_for(lambda: s.stats["coalesced"] == 1)
+    model.gate.set()
+    leader.join(5)
+    follower.join(5)
+    assert first["value"] == second["value"]
+    assert s.stats["calls"] == 1
+    assert not s.flights
+
+
+def test_different_keys_are_not_coalesced():
+    s, model = Scheduler(), GatedModel()
+    model.gate.set()
+    s.generate(model, "hello", "key-a")
+    s.generate(model, "hello", "key-b")
+    assert s.stats == {"calls": 2, "coalesced": 0, "retries": 0}
+    assert ("key", "key-a") in s.buckets and ("key", "key-b") in s.buckets
+
+
+def test_follower_retries_when_stream_leader_is_cancelled():
+    s, model = Scheduler(), GatedModel()
+    stream = s.stream(model, "hello", "key")
+    model.gate.set()
+    first_chunk = next(stream)
+    follower, result = in_thread(lambda: "".join(s.stream(model, "hello", "key")))
+    wait_for(lambda: s.stats["coalesced"] == 1)
+    stream.close()
+    follower.join(5)
+    assert first_chunk and result["value"].startswith(first_chunk)
+    assert s.stats["calls"] == 2
+    assert not s.flights
+
+
+def test_follower_retries_when_leader_stops_with_base_exception():
+    class Stopped(BaseException):
+        pass
+
+    s, model = Scheduler(), GatedModel()
+    model.gate.set()
+    stream = s.stream(model, "hello", "key")
+    next(stream)
+    follower, result = in_thread(lambda: "".join(s.stream(model, "hello", "key")))
+    wait_for(lambda: s.stats["coalesced"] == 1)
+    with pytest.raises(Stopped):
+        stream.throw(Stopped())
+    follower.join(5)
+    assert not follower.is_alive()
+    assert result["value"]
+    assert s.stats["calls"] == 2
+    assert not s.flights
+
+
+def test_quota_errors_are_retried():
+    s, model = Scheduler(), GatedModel(failures=2)
+    model.gate.set()
+    assert s.generate(model, "hello", "key")
+    assert s.stats["calls"] == 3
+    assert s.stats["retries"] == 2
+
+
+def test_retries_give_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(scheduler, "MAX_RETRIES", 1)
+    s, model = Scheduler(), GatedModel(failures=5)
+    model.gate.set()
+    with pytest.raises(ResourceExhausted):
+        s.generate(model, "hello", "key")
+    assert s.stats["calls"] == 2
+
+
+def test_per_user_cap_limits_concurrent_calls(monkeypatch):
+    monkeypatch.setitem(scheduler.USER_POOL_SIZES, "default", 1)
+    s, model = Scheduler(), GatedModel()
+    threads = [in_thread(s.generate, model, f"prompt {n}", "key", "alice")[0] for n in range(3)]
+    model.entered.wait(5)
+    time.sleep(0.05)
+    assert model.running == 1
+    model.gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert model.peak == 1
+    assert s.stats["calls"] == 3
+
+
+def test_user_pools_have_separate_caps(monkeypatch):
+    monkeypatch.setitem(scheduler.USER_POOL_SIZES, "default", 1)
+    s, model = Scheduler(), GatedModel()
+
+    def in_subcalls(prompt):
+        with user_pool("subcalls"):
+            return s.generate(model, prompt, "key", "alice")
+
+    threads = [in_thread(s.generate, model, "main", "key", "alice")[0]]
+    threads += [in_thread(in_subcalls, f"part {n}")[0] for n in range(3)]
+    wait_for(lambda: model.running == 4)
+    model.gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert model.peak == 4